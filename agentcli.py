@@ -1,6 +1,5 @@
 import asyncio
 import os
-import shutil
 import logging
 import sys
 import json
@@ -27,8 +26,8 @@ else:
 
 # --- LOCAL MODULE IMPORTS (AFTER .ENV LOAD) ---
 from agents import Runner, trace # Assuming Runner is the correct class providing the run method
-from mcp_local_modules.mcp_utils import Colors, setup_colored_logger, install_basic_packages, ensure_venv_exists, indent_multiline_text
-from mcp_local_modules.mcp_server_config import configure_servers
+from mcp_local_modules.mcp_utils import Colors, setup_colored_logger, prepare_env, indent_multiline_text, truncate_text, have, print_info, print_error
+from mcp_local_modules.mcp_server_config import configure_servers, release_servers
 from mcp_local_modules.mcp_agent_setup import setup_agent
 from cli import cli_config # Now this should pick up the env var correctly
 from cli.cli_ui import select_model_interactive
@@ -49,17 +48,17 @@ if _loaded_dotenv_message:
 # --- CONFIGURATION CHECKS (Now cli_config should have the correct values) ---
 if not cli_config.OPENROUTER_API_KEY:
     logger.error("OPENROUTER_API_KEY not found in .env file. Please add it.")
-    print(f"{Colors.LOG_ERROR}OPENROUTER_API_KEY not found in .env file. Please add it.{Colors.ENDC}")
+    print_error("OPENROUTER_API_KEY not found in .env file. Please add it.")
     sys.exit(1)
 
 # Check for npx and uvx
-if not shutil.which("npx"):
+if not have("npx"):
     logger.error("npx command not found. Please install Node.js and npm from https://nodejs.org/")
-    print(f"{Colors.LOG_ERROR}npx command not found. Please install Node.js and npm.{Colors.ENDC}")
+    print_error("npx command not found. Please install Node.js and npm.")
     sys.exit(1)
-if not shutil.which("uvx"):
+if not have("uvx"):
     logger.error("uvx command not found. Please ensure uvx (part of uv) is installed and in your PATH. See https://github.com/astral-sh/uv")
-    print(f"{Colors.LOG_ERROR}uvx command not found. Please install uv.{Colors.ENDC}")
+    print_error("uvx command not found. Please install uv.")
     sys.exit(1)
 
 # Global variables for the agent and its instructions text.
@@ -84,11 +83,8 @@ async def handle_ollama_chat(model_name, msgs, logger_instance, enc):
         - The number of prompt tokens
         - The number of completion tokens
     """
-    # Create a client for Ollama
-    client = OpenAI(
-        base_url=cli_config.OLLAMA_BASE_URL,
-        api_key="ollama"  # Dummy API key
-    )
+    # Reuse the shared Ollama client instead of creating one per message
+    client = cli_model_handler.get_ollama_client()
     
     logger_instance.info(f"Using direct Ollama chat with model: {model_name}")
     
@@ -151,6 +147,8 @@ async def handle_ollama_chat(model_name, msgs, logger_instance, enc):
             logger_instance.error(f"Error details: {e.body}")
         raise
 
+_MISSING = object() # getattr default, so probing an attribute and reading it is a single lookup
+
 # Helper function to print details of a single raw model response step
 def print_single_raw_response_step(step_number, raw_model_response, Colors_obj, logger_obj, indent_func, json_module):
     """
@@ -159,28 +157,31 @@ def print_single_raw_response_step(step_number, raw_model_response, Colors_obj,
     """
     print(f"{Colors_obj.HEADER}Step {step_number}: Raw Model Response Type: {type(raw_model_response).__name__}{Colors_obj.ENDC}")
 
-    if not hasattr(raw_model_response, 'output') or not isinstance(raw_model_response.output, list):
+    raw_output = getattr(raw_model_response, 'output', _MISSING)
+    if not isinstance(raw_output, list):
         print(f"{Colors_obj.LOG_WARNING}  Skipping raw_model_response: 'output' attribute missing or not a list.{Colors_obj.ENDC}")
         try: print(f"{Colors_obj.LOG_WARNING}    Preview: {str(raw_model_response)[:200]}...{Colors_obj.ENDC}")
         except: pass
         return
 
-    for output_item_idx, output_item in enumerate(raw_model_response.output):
+    for output_item_idx, output_item in enumerate(raw_output):
         print(f"{Colors_obj.SYSTEM_INFO}  Output Item [{output_item_idx+1}] Type: {type(output_item).__name__}{Colors_obj.ENDC}")
         item_processed_for_verbose = False
 
-        if hasattr(output_item, 'arguments'): 
+        tool_args_str = getattr(output_item, 'arguments', _MISSING)
+        if tool_args_str is not _MISSING: 
             item_processed_for_verbose = True
             tool_name_attr = getattr(output_item, 'name', None)
             if tool_name_attr is None: 
-                if hasattr(output_item, 'function_call') and hasattr(output_item.function_call, 'name'):
-                    tool_name_attr = output_item.function_call.name
-                elif hasattr(output_item, 'tool_name'): 
-                    tool_name_attr = output_item.tool_name
+                function_call = getattr(output_item, 'function_call', _MISSING)
+                function_call_name = getattr(function_call, 'name', _MISSING)
+                if function_call_name is not _MISSING:
+                    tool_name_attr = function_call_name
+                else:
+                    tool_name_attr = getattr(output_item, 'tool_name', None)
 
             # step_number is 1-based, so use step_number-1 for 0-based indexing if needed for ID generation
             tool_id_attr = getattr(output_item, 'id', f"generated_id_{step_number-1}_{output_item_idx}")
-            tool_args_str = output_item.arguments
 
             print(f"{Colors_obj.TOOL_INFO}  Assistant Action (from Raw Response): Call Tool{Colors_obj.ENDC}")
             print(f"{Colors_obj.TOOL_INFO}    Tool Call ID: {tool_id_attr}{Colors_obj.ENDC}")
@@ -212,25 +213,153 @@ def print_single_raw_response_step(step_number, raw_model_response, Colors_obj,
                 logger_obj.error(f"Error processing/displaying arguments for {tool_name_attr} in Raw Response: {tool_args_str} - Error: {e}")
                 print(f"{Colors_obj.AGENT_MESSAGE}    Arguments (error displaying):{Colors_obj.ENDC}\n{Colors_obj.CODE_ERROR}{indent_func(str(tool_args_str), '      ')}{Colors_obj.ENDC}")
 
-        elif hasattr(output_item, 'content') and isinstance(output_item.content, list) and \
-                len(output_item.content) > 0 and hasattr(output_item.content[0], 'text') and \
-                isinstance(output_item.content[0].text, str) :
+        elif isinstance(item_content := getattr(output_item, 'content', None), list) and item_content and \
+                isinstance(getattr(item_content[0], 'text', None), str) :
             item_processed_for_verbose = True
-            tool_response_content_str = output_item.content[0].text
+            tool_response_content_str = item_content[0].text
             message_id = getattr(output_item, 'id', "unknown_message_id") 
             print(f"{Colors_obj.AGENT_PROMPT}  Assistant Interpreted Tool Output (from Raw Response, msg_id: {message_id}){Colors_obj.ENDC}")
             print(f"{Colors_obj.AGENT_MESSAGE}{indent_func(tool_response_content_str, '    ')}{Colors_obj.ENDC}")
         
-        elif hasattr(output_item, 'text'): 
+        elif (item_text := getattr(output_item, 'text', _MISSING)) is not _MISSING: 
             item_processed_for_verbose = True
             print(f"{Colors_obj.AGENT_PROMPT}  Assistant Says (direct text from Raw Response):{Colors_obj.ENDC}")
-            print(f"{Colors_obj.AGENT_MESSAGE}{indent_func(output_item.text, '    ')}{Colors_obj.ENDC}")
+            print(f"{Colors_obj.AGENT_MESSAGE}{indent_func(item_text, '    ')}{Colors_obj.ENDC}")
         
         if not item_processed_for_verbose:
             print(f"{Colors_obj.LOG_WARNING}    Raw Response Output item has unknown structure: {str(output_item)[:200]}...{Colors_obj.ENDC}")
         print(f"{Colors_obj.HEADER}  ---{Colors_obj.ENDC}")
 
 
+def _render_turn(conversation_history, logger_obj):
+    """
+    Prints the processed conversation history (SDK messages) for the turn that just finished.
+    """
+    # Bind the colour codes used by the history dump to locals once per turn.
+    (c_header, c_user_prompt, c_agent_prompt, c_agent_message, c_tool_info, c_code_output,
+     c_code_error, c_system_info, c_log_warning, c_bold, c_endc) = (
+        Colors.HEADER, Colors.USER_PROMPT, Colors.AGENT_PROMPT, Colors.AGENT_MESSAGE, Colors.TOOL_INFO, Colors.CODE_OUTPUT,
+        Colors.CODE_ERROR, Colors.SYSTEM_INFO, Colors.LOG_WARNING, Colors.BOLD, Colors.ENDC)
+    print(f"\n{c_system_info}--- Processed Conversation History (SDK Messages) ---{c_endc}")
+
+    for hist_idx, hist_item in enumerate(conversation_history):
+        role = hist_item.get('role')
+        item_type = hist_item.get('type') 
+
+        print(f"{c_header}History Item {hist_idx + 1}: Role: {role if role else 'N/A'}, Type: {item_type if item_type else 'N/A'}{c_endc}")
+
+        if role == 'user':
+            print(f"{c_user_prompt}  Content: {hist_item.get('content')}{c_endc}")
+
+        elif role == 'assistant' or item_type == 'function_call': 
+            assistant_content = hist_item.get('content')
+            tool_calls_list = hist_item.get('tool_calls') or ((hist_item,) if item_type == 'function_call' else ())
+
+            if tool_calls_list:
+                print(f"{c_tool_info}  Tool Calls by Assistant (from SDK History):{c_endc}")
+                for tc_idx, tc_call_item in enumerate(tool_calls_list):
+                    call_id = tc_call_item.get('id')
+                    func_details = tc_call_item.get('function')
+                    if isinstance(func_details, dict): 
+                        func_name = func_details.get('name')
+                        func_args_str = func_details.get('arguments')
+                    else: # Responses-style function_call items carry name/arguments at the top level
+                        func_name = tc_call_item.get('name')
+                        func_args_str = tc_call_item.get('arguments')
+
+                    print(f"{c_tool_info}    Call [{tc_idx+1}] ID: {call_id}{c_endc}")
+                    print(f"{c_tool_info}      Function Name: {c_bold}{func_name}{c_endc}")
+                    print(f"{c_agent_message}      Arguments (JSON str): {func_args_str}{c_endc}")
+
+            if assistant_content and role == 'assistant': 
+                print(f"{c_agent_prompt}  Text Content: {assistant_content}{c_endc}")
+            elif not tool_calls_list and not assistant_content and role == 'assistant' :
+                 print(f"{c_agent_prompt}  (No text content or tool calls for assistant message){c_endc}")
+
+        elif role == 'tool' or item_type == 'function_call_output': 
+            tool_call_id_ref = hist_item.get('tool_call_id') or hist_item.get('call_id') 
+            tool_name_invoked = hist_item.get('name', 'UnknownToolName') 
+
+            print(f"{c_tool_info}  Tool Execution Result (for Call ID: ~{tool_call_id_ref}){c_endc}")
+            if role == 'tool': 
+                 print(f"{c_tool_info}    Tool Name Invoked: {c_bold}{tool_name_invoked}{c_endc}")
+
+            raw_tool_output_str = hist_item.get('content') if role == 'tool' else hist_item.get('output')
+
+            print(f"{c_tool_info}    Raw Output String from Tool System:{c_endc}")
+            print(f"{c_code_output}{indent_multiline_text(truncate_text(raw_tool_output_str, cli_config.MAX_RENDER_BYTES), '      ')}{c_endc}")
+
+            mcp_executor_response_str = None
+            try:
+                if isinstance(raw_tool_output_str, str):
+                    outer_parsed = json.loads(raw_tool_output_str)
+                    if isinstance(outer_parsed, dict) and outer_parsed.get('type') == 'text' and 'text' in outer_parsed:
+                        mcp_executor_response_str = outer_parsed['text']
+                        print(f"{c_tool_info}    Extracted MCP Executor Response String:{c_endc}")
+                        print(f"{c_code_output}{indent_multiline_text(truncate_text(mcp_executor_response_str, cli_config.MAX_RENDER_BYTES), '      ')}{c_endc}")
+                    else: 
+                        mcp_executor_response_str = raw_tool_output_str
+                else: 
+                    mcp_executor_response_str = str(raw_tool_output_str)
+
+            except json.JSONDecodeError:
+                mcp_executor_response_str = raw_tool_output_str if isinstance(raw_tool_output_str, str) else str(raw_tool_output_str)
+                logger_obj.debug(f"Raw tool output string was not JSON or not structured as expected: {raw_tool_output_str}")
+            except Exception as e:
+                logger_obj.error(f"Error parsing outer tool output string: {e}")
+                mcp_executor_response_str = f"Error parsing outer tool output: {e}"
+
+
+            if mcp_executor_response_str:
+                print(f"{c_tool_info}    Final Content from MCP Executor (attempting to parse as JSON):{c_endc}")
+                try:
+                    if not isinstance(mcp_executor_response_str, str):
+                        mcp_executor_response_str = str(mcp_executor_response_str)
+
+                    parsed_mcp_output = json.loads(mcp_executor_response_str)
+                    pretty_mcp_output = json.dumps(parsed_mcp_output, indent=2, ensure_ascii=False)
+
+                    is_error_mcp_response = False
+                    status_val = None
+                    if isinstance(parsed_mcp_output, dict):
+                        status_val = parsed_mcp_output.get('status')
+                        if status_val == 'error' or parsed_mcp_output.get('isError'):
+                            is_error_mcp_response = True
+
+                    display_color = c_code_error if is_error_mcp_response else c_code_output
+                    print(f"{display_color}{indent_multiline_text(truncate_text(pretty_mcp_output, cli_config.MAX_RENDER_BYTES), '      ')}{c_endc}")
+
+                    if status_val is not None:
+                        # Each key is fetched once; the details are emitted as a single print.
+                        file_path_val = parsed_mcp_output.get('file_path')
+                        generated_filename_val = parsed_mcp_output.get('generated_filename')
+                        out_val = parsed_mcp_output.get('output')
+                        err_val = parsed_mcp_output.get('error')
+                        msg_val = parsed_mcp_output.get('message')
+                        details_buf = [f"{c_tool_info}      Parsed Details from MCP Executor Content:{c_endc}",
+                                       f"{c_bold}        Status:{c_endc} {status_val}"]
+                        if file_path_val is not None: details_buf.append(f"{c_bold}        File Path:{c_endc} {file_path_val}")
+                        if generated_filename_val is not None: details_buf.append(f"{c_bold}        Generated Filename:{c_endc} {generated_filename_val}")
+                        if out_val is not None: details_buf.append(f"{c_bold}        Output:{c_endc}\n{c_code_output}{indent_multiline_text(str(out_val), '          ')}{c_endc}")
+                        if err_val: details_buf.append(f"{c_bold}        Error:{c_endc}\n{c_code_error}{indent_multiline_text(err_val, '          ')}{c_endc}")
+                        if msg_val and out_val is None and not err_val: details_buf.append(f"{c_bold}        Message:{c_endc}\n{c_code_output}{indent_multiline_text(msg_val, '          ')}{c_endc}")
+                        print("\n".join(details_buf))
+                except json.JSONDecodeError:
+                    print(f"{c_code_output}{indent_multiline_text(truncate_text(mcp_executor_response_str, cli_config.MAX_RENDER_BYTES), '      ')} (Content was not valid JSON){c_endc}")
+                except Exception as e:
+                    logger_obj.error(f"Error displaying final MCP executor content: {e}")
+                    print(f"{c_code_error}{indent_multiline_text(truncate_text(mcp_executor_response_str, cli_config.MAX_RENDER_BYTES), '      ')} (Error formatting: {e}){c_endc}")
+
+        elif isinstance(hist_item, dict): 
+            print(f"{c_log_warning}  Other item in history (keys: {list(hist_item.keys())}):{c_endc}")
+            try:
+                print(f"{c_log_warning}    Full item: {json.dumps(hist_item, indent=2, default=str)}{c_endc}")
+            except TypeError: 
+                print(f"{c_log_warning}    Full item (raw): {hist_item}{c_endc}")
+
+        print(f"{c_header}  ---{c_endc}")
+
+
 async def main():
     # current_model_name and enc are local to main and updated by the model handler.
     current_model_name = cli_config.DEFAULT_MODEL
@@ -249,45 +378,53 @@ async def main():
         logger.warning(f"Sample directory does not exist: {samples_dir}, creating it.")
         os.makedirs(samples_dir, exist_ok=True)
 
-    venv_path = os.path.join(samples_dir, "venv")
-    venv_success, venv_created = ensure_venv_exists(logger, venv_path)
-    
-    if not venv_success:
-        logger.error("Failed to create or verify virtual environment. Code execution may fail.")
-        print(f"{Colors.LOG_ERROR}Failed to create or verify virtual environment. Code execution may fail.{Colors.ENDC}")
-    elif venv_created:
-        if install_basic_packages(logger, venv_path):
-            logger.info("Basic packages installed successfully in the new virtual environment.")
-        else:
-            logger.warning("Failed to install basic packages. Some code execution may fail.")
-            print(f"{Colors.LOG_WARNING}Failed to install basic packages. Some code execution may fail.{Colors.ENDC}")
+    # Venv creation and pip run while the MCP servers spawn; the venv is only needed once code is executed
+    prepare_env_task = asyncio.create_task(prepare_env(logger, samples_dir))
 
     configured_server_instances = await configure_servers(logger, script_dir, samples_dir)
     
+    async def connect_server(server_instance):
+        try:
+            await server_instance.connect()
+            logger.info(f"Successfully connected to {server_instance.name}.")
+            print_info(f"Successfully connected to {server_instance.name}.")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to connect to {server_instance.name}: {e}")
+            print_error(f"Failed to connect to {server_instance.name}: {e}")
+            try:
+                await server_instance.cleanup()
+            except Exception as cleanup_e:
+                logger.error(f"Error during cleanup of failed server {server_instance.name}: {cleanup_e}")
+            return False
+
     successfully_connected_servers = []
     if configured_server_instances:
         logger.info(f"Attempting to connect to {len(configured_server_instances)} configured MCP server(s)...")
-        for server_instance in configured_server_instances:
-            try:
-                await server_instance.connect()
-                logger.info(f"Successfully connected to {server_instance.name}.")
-                print(f"{Colors.LOG_INFO}Successfully connected to {server_instance.name}.{Colors.ENDC}")
-                successfully_connected_servers.append(server_instance)
-            except Exception as e:
-                logger.error(f"Failed to connect to {server_instance.name}: {e}")
-                print(f"{Colors.LOG_ERROR}Failed to connect to {server_instance.name}: {e}{Colors.ENDC}")
-                try:
-                    await server_instance.cleanup()
-                except Exception as cleanup_e:
-                    logger.error(f"Error during cleanup of failed server {server_instance.name}: {cleanup_e}")
+        # Start all servers at once so startup takes as long as the slowest server, not the sum of all of them
+        async with asyncio.TaskGroup() as task_group:
+            connect_tasks = [task_group.create_task(connect_server(server_instance)) for server_instance in configured_server_instances]
+        successfully_connected_servers = [
+            server_instance for server_instance, connect_task in zip(configured_server_instances, connect_tasks) if connect_task.result()
+        ]
+
+    venv_success, packages_success = await prepare_env_task
+    if not venv_success:
+        logger.error("Failed to create or verify virtual environment. Code execution may fail.")
+        print_error("Failed to create or verify virtual environment. Code execution may fail.")
+    elif packages_success:
+        logger.info("Basic packages are available in the virtual environment.")
+    else:
+        logger.warning("Failed to install basic packages. Some code execution may fail.")
+        print(f"{Colors.LOG_WARNING}Failed to install basic packages. Some code execution may fail.{Colors.ENDC}")
     
     if not successfully_connected_servers:
         logger.error("No MCP servers connected successfully. Exiting application.")
-        print(f"{Colors.LOG_ERROR}No MCP servers connected successfully. Exiting application.{Colors.ENDC}")
+        print_error("No MCP servers connected successfully. Exiting application.")
         return
 
     logger.info(f"Total successfully connected servers: {len(successfully_connected_servers)} out of {len(configured_server_instances)} configured.")
-    print(f"{Colors.LOG_INFO}Total successfully connected servers: {len(successfully_connected_servers)} out of {len(configured_server_instances)} configured. Starting interactive chat...{Colors.ENDC}")
+    print_info(f"Total successfully connected servers: {len(successfully_connected_servers)} out of {len(configured_server_instances)} configured. Starting interactive chat...")
 
     openrouter_client = OpenAI(
         base_url=cli_config.OPENROUTER_BASE_URL,
@@ -309,12 +446,8 @@ async def main():
             yield
         finally:
             logger.info(f"Cleaning up {len(servers_to_manage)} server connection(s)...")
-            for server in servers_to_manage:
-                try:
-                    await server.cleanup()
-                    logger.info(f"Successfully cleaned up server: {server.name}")
-                except Exception as e:
-                    logger.error(f"Error cleaning up server {server.name}: {e}")
+            # Pooled servers are only shut down once no other session still holds them
+            await release_servers(logger)
             logger.info("All server cleanups attempted.")
 
     async with manage_server_connections(successfully_connected_servers):
@@ -330,7 +463,8 @@ async def main():
         with trace("MCP Interactive Session"):
             while True:
                 try:
-                    user_input_text = input(f"\n{Colors.BOLD}{Colors.USER_PROMPT}You ({current_model_name}): {Colors.ENDC}")
+                    # Read input off the event loop so MCP stdio readers keep running meanwhile.
+                    user_input_text = await asyncio.to_thread(input, f"\n{Colors.BOLD}{Colors.USER_PROMPT}You ({current_model_name}): {Colors.ENDC}")
                     if user_input_text.lower() in ["quit", "exit"]:
                         print(f"{Colors.SYSTEM_INFO}Exiting chat.{Colors.ENDC}")
                         break
@@ -356,7 +490,7 @@ async def main():
                                         selected_model,
                                         logger, successfully_connected_servers, samples_dir,
                                         openrouter_client, cli_config.EXTRA_HEADERS, 
-                                        cli_config.TIKTOKEN_MAPPING, cli_config.SUPPORTED_MODELS
+                                        cli_config.TIKTOKEN_MAPPING, cli_config.SUPPORTED_MODEL_SET
                                     )
                             else:
                                 print(f"{Colors.SYSTEM_INFO}Model is already set to: {current_model_name}{Colors.ENDC}")
@@ -368,21 +502,21 @@ async def main():
                         parts = user_input_text.split(" ", 1)
                         if len(parts) > 1 and parts[1].strip():
                             new_model_candidate = parts[1].strip()
-                            if new_model_candidate in cli_config.SUPPORTED_MODELS:
+                            if new_model_candidate in cli_config.SUPPORTED_MODEL_SET:
                                 if new_model_candidate != current_model_name:
                                     agent, agent_instructions_text, current_model_name, enc = \
                                         await cli_model_handler.update_model_and_agent_config(
                                             new_model_candidate,
                                             logger, successfully_connected_servers, samples_dir,
                                             openrouter_client, cli_config.EXTRA_HEADERS,
-                                            cli_config.TIKTOKEN_MAPPING, cli_config.SUPPORTED_MODELS
+                                            cli_config.TIKTOKEN_MAPPING, cli_config.SUPPORTED_MODEL_SET
                                         )
                                 else:
                                     print(f"{Colors.SYSTEM_INFO}Model is already set to: {current_model_name}{Colors.ENDC}")
                             else:
-                                print(f"{Colors.LOG_ERROR}Invalid model. Supported models: {', '.join(cli_config.SUPPORTED_MODELS)}{Colors.ENDC}")
+                                print_error(f"Invalid model. Supported models: {', '.join(cli_config.SUPPORTED_MODELS)}")
                         else:
-                            print(f"{Colors.LOG_ERROR}Usage: /model (interactive) or /model <model_name>. Supported: {', '.join(cli_config.SUPPORTED_MODELS)}{Colors.ENDC}")
+                            print_error(f"Usage: /model (interactive) or /model <model_name>. Supported: {', '.join(cli_config.SUPPORTED_MODELS)}")
                         continue
                     
                     if user_input_text.lower() == "/newchat":
@@ -554,14 +688,12 @@ async def main():
                     
                     current_conversation_history = result.to_input_list()
 
-                    if hasattr(result, "usage") and result.usage and \
-                       hasattr(result.usage, 'prompt_tokens') and \
-                       hasattr(result.usage, 'completion_tokens') and \
-                       hasattr(result.usage, 'total_tokens'):
-                        pt = result.usage.prompt_tokens
-                        ct = result.usage.completion_tokens
-                        tt = result.usage.total_tokens
-                    else: 
+                    try:
+                        usage = result.usage
+                        pt, ct, tt = usage.prompt_tokens, usage.completion_tokens, usage.total_tokens
+                        if pt is None or ct is None or tt is None:
+                            raise AttributeError("usage is incomplete")
+                    except AttributeError: # No usage reported (e.g. direct Ollama chat), so estimate with the tokenizer
                         final_output_str = result.final_output if isinstance(result.final_output, str) else str(result.final_output or "")
                         if enc: 
                             ct = len(enc.encode(final_output_str))
@@ -571,8 +703,7 @@ async def main():
                         pt = prompt_tokens 
                         tt = pt + ct
                     
-                    cost = (pt / 1000) * cli_config.PROMPT_PRICE_PER_1K + \
-                           (ct / 1000) * cli_config.COMPLETION_PRICE_PER_1K
+                    cost = pt * cli_config.PROMPT_PRICE_PER_TOKEN + ct * cli_config.COMPLETION_PRICE_PER_TOKEN
                     
                     total_conversation_prompt_tokens += pt
                     total_conversation_completion_tokens += ct
@@ -606,127 +737,12 @@ async def main():
                              current_conversation_history.append({"role": "assistant", "content": final_streamed_output_text})
 
 
-                    print(f"\n{Colors.SYSTEM_INFO}--- Processed Conversation History (SDK Messages) ---{Colors.ENDC}")
                     if not current_conversation_history and hasattr(result, '_previous_result_for_history_only_for_debugging'): # Example of a potential internal
                         logger.warning("Using a debug/internal attribute for history. This is not robust.")
                         current_conversation_history = result._previous_result_for_history_only_for_debugging.to_input_list()
 
-
-                    for hist_idx, hist_item in enumerate(current_conversation_history):
-                        role = hist_item.get('role')
-                        item_type = hist_item.get('type') 
-                        
-                        print(f"{Colors.HEADER}History Item {hist_idx + 1}: Role: {role if role else 'N/A'}, Type: {item_type if item_type else 'N/A'}{Colors.ENDC}")
-                        
-                        if role == 'user':
-                            print(f"{Colors.USER_PROMPT}  Content: {hist_item.get('content')}{Colors.ENDC}")
-                        
-                        elif role == 'assistant' or item_type == 'function_call': 
-                            assistant_content = hist_item.get('content')
-                            tool_calls_list = hist_item.get('tool_calls') 
-                            if not tool_calls_list and item_type == 'function_call': 
-                                tool_calls_list = [hist_item] 
-
-                            if tool_calls_list:
-                                print(f"{Colors.TOOL_INFO}  Tool Calls by Assistant (from SDK History):{Colors.ENDC}")
-                                for tc_idx, tc_call_item in enumerate(tool_calls_list):
-                                    call_id = tc_call_item.get('id')
-                                    func_name = None
-                                    func_args_str = None
-
-                                    if 'function' in tc_call_item and isinstance(tc_call_item['function'], dict): 
-                                        func_details = tc_call_item.get('function', {})
-                                        func_name = func_details.get('name')
-                                        func_args_str = func_details.get('arguments')
-                                    elif 'name' in tc_call_item and 'arguments' in tc_call_item: 
-                                        func_name = tc_call_item.get('name')
-                                        func_args_str = tc_call_item.get('arguments')
-                                    
-                                    print(f"{Colors.TOOL_INFO}    Call [{tc_idx+1}] ID: {call_id}{Colors.ENDC}")
-                                    print(f"{Colors.TOOL_INFO}      Function Name: {Colors.BOLD}{func_name}{Colors.ENDC}")
-                                    print(f"{Colors.AGENT_MESSAGE}      Arguments (JSON str): {func_args_str}{Colors.ENDC}")
-
-                            if assistant_content and role == 'assistant': 
-                                print(f"{Colors.AGENT_PROMPT}  Text Content: {assistant_content}{Colors.ENDC}")
-                            elif not tool_calls_list and not assistant_content and role == 'assistant' :
-                                 print(f"{Colors.AGENT_PROMPT}  (No text content or tool calls for assistant message){Colors.ENDC}")
-
-                        elif role == 'tool' or item_type == 'function_call_output': 
-                            tool_call_id_ref = hist_item.get('tool_call_id') or hist_item.get('call_id') 
-                            tool_name_invoked = hist_item.get('name', 'UnknownToolName') 
-                            
-                            print(f"{Colors.TOOL_INFO}  Tool Execution Result (for Call ID: ~{tool_call_id_ref}){Colors.ENDC}")
-                            if role == 'tool': 
-                                 print(f"{Colors.TOOL_INFO}    Tool Name Invoked: {Colors.BOLD}{tool_name_invoked}{Colors.ENDC}")
-                            
-                            raw_tool_output_str = hist_item.get('content') if role == 'tool' else hist_item.get('output')
-
-                            print(f"{Colors.TOOL_INFO}    Raw Output String from Tool System:{Colors.ENDC}")
-                            print(f"{Colors.CODE_OUTPUT}{indent_multiline_text(raw_tool_output_str, '      ')}{Colors.ENDC}")
-                            
-                            mcp_executor_response_str = None
-                            try:
-                                if isinstance(raw_tool_output_str, str):
-                                    outer_parsed = json.loads(raw_tool_output_str)
-                                    if isinstance(outer_parsed, dict) and outer_parsed.get('type') == 'text' and 'text' in outer_parsed:
-                                        mcp_executor_response_str = outer_parsed['text']
-                                        print(f"{Colors.TOOL_INFO}    Extracted MCP Executor Response String:{Colors.ENDC}")
-                                        print(f"{Colors.CODE_OUTPUT}{indent_multiline_text(mcp_executor_response_str, '      ')}{Colors.ENDC}")
-                                    else: 
-                                        mcp_executor_response_str = raw_tool_output_str
-                                else: 
-                                    mcp_executor_response_str = str(raw_tool_output_str)
-
-                            except json.JSONDecodeError:
-                                mcp_executor_response_str = raw_tool_output_str if isinstance(raw_tool_output_str, str) else str(raw_tool_output_str)
-                                logger.debug(f"Raw tool output string was not JSON or not structured as expected: {raw_tool_output_str}")
-                            except Exception as e:
-                                logger.error(f"Error parsing outer tool output string: {e}")
-                                mcp_executor_response_str = f"Error parsing outer tool output: {e}"
-
-
-                            if mcp_executor_response_str:
-                                print(f"{Colors.TOOL_INFO}    Final Content from MCP Executor (attempting to parse as JSON):{Colors.ENDC}")
-                                try:
-                                    if not isinstance(mcp_executor_response_str, str):
-                                        mcp_executor_response_str = str(mcp_executor_response_str)
-
-                                    parsed_mcp_output = json.loads(mcp_executor_response_str)
-                                    pretty_mcp_output = json.dumps(parsed_mcp_output, indent=2, ensure_ascii=False)
-                                    
-                                    is_error_mcp_response = False
-                                    if isinstance(parsed_mcp_output, dict):
-                                        if parsed_mcp_output.get('status') == 'error' or parsed_mcp_output.get('isError'):
-                                            is_error_mcp_response = True
-                                    
-                                    display_color = Colors.CODE_ERROR if is_error_mcp_response else Colors.CODE_OUTPUT
-                                    print(f"{display_color}{indent_multiline_text(pretty_mcp_output, '      ')}{Colors.ENDC}")
-
-                                    if isinstance(parsed_mcp_output, dict) and 'status' in parsed_mcp_output:
-                                        print(f"{Colors.TOOL_INFO}      Parsed Details from MCP Executor Content:{Colors.ENDC}")
-                                        if 'status' in parsed_mcp_output: print(f"{Colors.BOLD}        Status:{Colors.ENDC} {parsed_mcp_output['status']}")
-                                        if 'file_path' in parsed_mcp_output: print(f"{Colors.BOLD}        File Path:{Colors.ENDC} {parsed_mcp_output['file_path']}")
-                                        if 'generated_filename' in parsed_mcp_output: print(f"{Colors.BOLD}        Generated Filename:{Colors.ENDC} {parsed_mcp_output['generated_filename']}")
-                                        out_val = parsed_mcp_output.get('output')
-                                        if out_val is not None: print(f"{Colors.BOLD}        Output:{Colors.ENDC}\n{Colors.CODE_OUTPUT}{indent_multiline_text(str(out_val), '          ')}{Colors.ENDC}")
-                                        err_val = parsed_mcp_output.get('error')
-                                        if err_val: print(f"{Colors.BOLD}        Error:{Colors.ENDC}\n{Colors.CODE_ERROR}{indent_multiline_text(err_val, '          ')}{Colors.ENDC}")
-                                        msg_val = parsed_mcp_output.get('message')
-                                        if msg_val and out_val is None and not err_val: print(f"{Colors.BOLD}        Message:{Colors.ENDC}\n{Colors.CODE_OUTPUT}{indent_multiline_text(msg_val, '          ')}{Colors.ENDC}")
-                                except json.JSONDecodeError:
-                                    print(f"{Colors.CODE_OUTPUT}{indent_multiline_text(mcp_executor_response_str, '      ')} (Content was not valid JSON){Colors.ENDC}")
-                                except Exception as e:
-                                    logger.error(f"Error displaying final MCP executor content: {e}")
-                                    print(f"{Colors.CODE_ERROR}{indent_multiline_text(mcp_executor_response_str, '      ')} (Error formatting: {e}){Colors.ENDC}")
-                        
-                        elif isinstance(hist_item, dict): 
-                            print(f"{Colors.LOG_WARNING}  Other item in history (keys: {list(hist_item.keys())}):{Colors.ENDC}")
-                            try:
-                                print(f"{Colors.LOG_WARNING}    Full item: {json.dumps(hist_item, indent=2, default=str)}{Colors.ENDC}")
-                            except TypeError: 
-                                print(f"{Colors.LOG_WARNING}    Full item (raw): {hist_item}{Colors.ENDC}")
-
-                        print(f"{Colors.HEADER}  ---{Colors.ENDC}")
+                    if cli_config.SHOW_HISTORY:
+                        _render_turn(current_conversation_history, logger)
 
                     print(f"{Colors.SYSTEM_INFO}[turn usage] prompt: {pt}, completion: {ct}, total: {tt}{Colors.ENDC}")
                     print(f"{Colors.SYSTEM_INFO}[turn cost] ${cost:.5f}{Colors.ENDC}")
@@ -737,7 +753,7 @@ async def main():
                     # Use the accumulated streamed text as the primary final output
                     print(f"{Colors.AGENT_MESSAGE}{final_streamed_output_text or (result.final_output if hasattr(result, 'final_output') else 'No output')}{Colors.ENDC}")
                     
-                except KeyboardInterrupt:
+                except (KeyboardInterrupt, asyncio.CancelledError): # Ctrl+C cancels the task awaiting input()
                     print(f"\n{Colors.SYSTEM_INFO}Exiting chat due to interrupt.{Colors.ENDC}")
                     break
                 except Exception as e: 
@@ -751,9 +767,9 @@ if __name__ == "__main__":
         asyncio.run(main())
     except RuntimeError as e:
         logger.error(f"Runtime error during script initialization: {e}")
-        print(f"{Colors.LOG_ERROR}Runtime error: {e}{Colors.ENDC}")
+        print_error(f"Runtime error: {e}")
         sys.exit(1)
     except Exception as e:
         logger.critical(f"An unexpected critical error occurred during script execution: {e}", exc_info=True)
-        print(f"{Colors.LOG_ERROR}An unexpected critical error occurred: {e}{Colors.ENDC}")
+        print_error(f"An unexpected critical error occurred: {e}")
         sys.exit(1)
@@ -1,6 +1,9 @@
+import functools
 import os
 import tiktoken
+from tiktoken.model import encoding_name_for_model
 import logging
+from types import MappingProxyType
 
 # ─── API AND REFERRER CONFIGURATION ───────────────────────────────────────────
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
@@ -21,6 +24,12 @@ EXTRA_HEADERS = {
     "X-Title": YOUR_SITE_NAME,
 }
 
+# ─── OUTPUT CONFIGURATION ─────────────────────────────────────────────────────
+# The detailed per-turn conversation history dump is opt-in; it gets expensive on long conversations.
+SHOW_HISTORY = os.getenv("AGENTCLI_SHOW_HISTORY", "0") == "1"
+# Tool outputs longer than this are truncated in the history dump (0 disables truncation).
+MAX_RENDER_BYTES = int(os.getenv("AGENTCLI_MAX_RENDER_BYTES", "8192"))
+
 # ─── MODEL DEFINITIONS AND MAPPINGS ───────────────────────────────────────────
 SUPPORTED_MODELS = [
     "openai/gpt-4o-mini",
@@ -31,10 +40,12 @@ SUPPORTED_MODELS = [
     "ollama/phi3:latest",           # Added example
     "ollama/mistral",          # Added example
 ]
+# Set view of SUPPORTED_MODELS for O(1) membership checks on model switches
+SUPPORTED_MODEL_SET = frozenset(SUPPORTED_MODELS)
 DEFAULT_MODEL = "openai/gpt-4o-mini"
 
 # Mapping for supported models to tiktoken base model names or direct encoding names
-TIKTOKEN_MAPPING = {
+TIKTOKEN_MAPPING = MappingProxyType({
     "openai/gpt-4o-mini": ("model", "gpt-4o"),
     "openai/gpt-4.1-mini": ("model", "gpt-4o"), # Assuming gpt-4o compatibility
     "openai/gpt-4.1-nano": ("model", "gpt-4o"), # Assuming gpt-4o compatibility
@@ -42,7 +53,12 @@ TIKTOKEN_MAPPING = {
     "ollama/phi4-mini:latest": ("model", "gpt-4o"), # Updated key and added example
     "ollama/phi3:latest": ("model", "gpt-4o"),           # Added example
     "ollama/mistral": ("model", "gpt-4o"),          # Added example
-}
+})
+
+# Each encoding (e.g. "o200k_base", "cl100k_base") is loaded at most once per process.
+@functools.lru_cache(maxsize=16)
+def _get_encoding_once(encoding_name: str) -> tiktoken.Encoding:
+    return tiktoken.get_encoding(encoding_name)
 
 # ─── PRICING CONFIGURATION ────────────────────────────────────────────────────
 # TODO: Implement dynamic pricing based on current_model_name
@@ -58,28 +74,34 @@ OLLAMA_COMPLETION_PRICE_PER_1K = 0.0
 PROMPT_PRICE_PER_1K = OPENAI_PROMPT_PRICE_PER_1K
 COMPLETION_PRICE_PER_1K = OPENAI_COMPLETION_PRICE_PER_1K
 
+# Per-token prices derived from the per-1K prices above, so the per-turn cost is a plain multiply.
+# Must be kept in sync whenever PROMPT_PRICE_PER_1K / COMPLETION_PRICE_PER_1K are reassigned.
+PROMPT_PRICE_PER_TOKEN = PROMPT_PRICE_PER_1K / 1000.0
+COMPLETION_PRICE_PER_TOKEN = COMPLETION_PRICE_PER_1K / 1000.0
+
 # ─── TOKENIZER INITIALIZATION FUNCTION ────────────────────────────────────────
 def initialize_tokenizer(model_name: str, tiktoken_map: dict, logger_instance: logging.Logger) -> tiktoken.Encoding:
     """
     Initializes and returns a tiktoken encoding for the given model.
+    The encodings themselves are loaded once and shared, so re-selecting a model is cheap.
     """
     _map_type, _map_value = tiktoken_map.get(model_name, (None, None))
 
     enc = None
     if "claude" in model_name: # Specific handling for Claude models
-        enc = tiktoken.encoding_for_model("gpt-4") # Use gpt-4 tokenizer for Claude
+        enc = _get_encoding_once(encoding_name_for_model("gpt-4")) # Use gpt-4 tokenizer for Claude
         logger_instance.info(f"Using 'gpt-4' base model for tiktoken with Claude model: {model_name}")
     elif _map_type == "encoding":
-        enc = tiktoken.get_encoding(_map_value)
+        enc = _get_encoding_once(_map_value)
         logger_instance.info(f"Using '{_map_value}' encoding for {model_name}.")
     elif _map_type == "model":
-        enc = tiktoken.encoding_for_model(_map_value)
+        enc = _get_encoding_once(encoding_name_for_model(_map_value))
         logger_instance.info(f"Using '{_map_value}' base model for tiktoken with {model_name}.")
     else: # Fallback for models not in TIKTOKEN_MAPPING and not Claude
         logger_instance.warning(f"No specific tiktoken mapping for {model_name}. Attempting 'cl100k_base' encoding.")
         try:
-            enc = tiktoken.get_encoding("cl100k_base")
+            enc = _get_encoding_once("cl100k_base")
         except Exception as e_enc:
             logger_instance.error(f"Failed to get 'cl100k_base' as fallback for {model_name}: {e_enc}. Using 'gpt2' encoding.")
-            enc = tiktoken.get_encoding("gpt2") # A very basic fallback
+            enc = _get_encoding_once("gpt2") # A very basic fallback
     return enc
@@ -1,8 +1,11 @@
 import logging
 import os
-from typing import List, Tuple, Any, Dict, Optional
-import tiktoken
-from openai import OpenAI # Needed to instantiate a new client for Ollama
+from collections import OrderedDict
+from typing import TYPE_CHECKING, AbstractSet, List, Tuple, Any, Dict, Optional
+
+if TYPE_CHECKING: # tiktoken and openai are only imported when actually needed at runtime
+    import tiktoken
+    from openai import OpenAI
 
 from mcp_local_modules.mcp_agent_setup import setup_agent
 from mcp_local_modules.mcp_utils import Colors
@@ -14,7 +17,27 @@ from .cli_config import initialize_tokenizer
 # This approach mirrors the original global usage but centralizes the update logic.
 # Consider passing these as part of a state object in a more complex application.
 current_model_name_global: str = "" # Will be set by the main script initially
-tokenizer_global: Optional[tiktoken.Encoding] = None # Will be set by the main script initially
+tokenizer_global: Optional["tiktoken.Encoding"] = None # Will be set by the main script initially
+
+# Agents built by previous switches, keyed by (model, servers, samples dir, base URL).
+# The key holds the server objects themselves, so a changed server list misses and a cached Agent is never
+# matched to servers that merely reuse a dead list's id(). Flipping back to a recently used model reuses its Agent.
+_AGENT_CACHE_MAXSIZE = 8
+_agent_cache: "OrderedDict[tuple, Tuple[Any, str]]" = OrderedDict()
+
+# Single OpenAI-compatible client for Ollama, shared across model switches so its connection pool stays warm.
+_ollama_client: Optional["OpenAI"] = None
+
+def get_ollama_client() -> "OpenAI":
+    """Returns the shared Ollama client, creating it on first use."""
+    global _ollama_client
+    if _ollama_client is None:
+        from openai import OpenAI # Deferred so startup does not pay for the openai import until Ollama is used
+        _ollama_client = OpenAI(
+            base_url=cli_config.OLLAMA_BASE_URL,
+            api_key="ollama", # Use a dummy API key for Ollama, as it requires a non-None value
+        )
+    return _ollama_client
 
 async def update_model_and_agent_config(
     new_model_name: str,
@@ -24,15 +47,15 @@ async def update_model_and_agent_config(
     openrouter_client: Any,   # The pre-configured OpenRouter client instance
     extra_headers: Dict[str, str],
     tiktoken_map: Dict[str, Tuple[str, str]],
-    supported_model_list: List[str]
-) -> Tuple[Any, str, str, Optional[tiktoken.Encoding]]:
+    supported_model_set: AbstractSet[str]
+) -> Tuple[Any, str, str, Optional["tiktoken.Encoding"]]:
     """
     Updates the global current model, re-initializes the agent and tokenizer.
     Returns the new agent instance, new agent instructions, the new model name, and the new tokenizer.
     """
     global current_model_name_global, tokenizer_global # Allow modification of these module-level globals
 
-    if new_model_name not in supported_model_list:
+    if new_model_name not in supported_model_set:
         logger_instance.error(f"Internal error: Attempted to switch to an unsupported model: {new_model_name}")
         # In case of error, return the current global state without changes
         # This requires current_model_name_global and tokenizer_global to be initialized before first call
@@ -49,23 +72,24 @@ async def update_model_and_agent_config(
     client_to_use = openrouter_client
     model_name_for_setup = current_model_name_global
 
-    if new_model_name.startswith("ollama/"):
+    is_ollama = new_model_name.startswith("ollama/")
+    if is_ollama:
         logger_instance.info(f"Configuring for Ollama model: {new_model_name}")
         # Use Ollama specific configurations
-        client_to_use = OpenAI(
-            base_url=cli_config.OLLAMA_BASE_URL,
-            api_key="ollama", # Use a dummy API key for Ollama, as it requires a non-None value
-        )
+        client_to_use = get_ollama_client()
         model_name_for_setup = new_model_name.split('/')[-1] # e.g., "llama3" from "ollama/llama3"
         
-        # Set environment variables for the Agent class to use
-        os.environ["OPENAI_API_KEY"] = "ollama"  # Dummy API key
-        os.environ["OPENAI_BASE_URL"] = cli_config.OLLAMA_BASE_URL
-        logger_instance.info(f"Set environment variables for Ollama: OPENAI_BASE_URL={cli_config.OLLAMA_BASE_URL}")
+        # Set environment variables for the Agent class to use, skipping the writes when they already point at Ollama
+        if os.environ.get("OPENAI_BASE_URL") != cli_config.OLLAMA_BASE_URL or os.environ.get("OPENAI_API_KEY") != "ollama":
+            os.environ["OPENAI_API_KEY"] = "ollama"  # Dummy API key
+            os.environ["OPENAI_BASE_URL"] = cli_config.OLLAMA_BASE_URL
+            logger_instance.info(f"Set environment variables for Ollama: OPENAI_BASE_URL={cli_config.OLLAMA_BASE_URL}")
         
         # Update pricing in cli_config (this modifies the imported module's attributes)
         cli_config.PROMPT_PRICE_PER_1K = cli_config.OLLAMA_PROMPT_PRICE_PER_1K
         cli_config.COMPLETION_PRICE_PER_1K = cli_config.OLLAMA_COMPLETION_PRICE_PER_1K
+        cli_config.PROMPT_PRICE_PER_TOKEN = cli_config.PROMPT_PRICE_PER_1K / 1000.0
+        cli_config.COMPLETION_PRICE_PER_TOKEN = cli_config.COMPLETION_PRICE_PER_1K / 1000.0
         logger_instance.info(f"Set pricing for Ollama: Prompt=${cli_config.PROMPT_PRICE_PER_1K}/1k, Completion=${cli_config.COMPLETION_PRICE_PER_1K}/1k")
 
     else: # Assuming OpenRouter model
@@ -74,18 +98,30 @@ async def update_model_and_agent_config(
         # Pricing for OpenRouter models (using OpenAI as a stand-in for now)
         cli_config.PROMPT_PRICE_PER_1K = cli_config.OPENAI_PROMPT_PRICE_PER_1K
         cli_config.COMPLETION_PRICE_PER_1K = cli_config.OPENAI_COMPLETION_PRICE_PER_1K
+        cli_config.PROMPT_PRICE_PER_TOKEN = cli_config.PROMPT_PRICE_PER_1K / 1000.0
+        cli_config.COMPLETION_PRICE_PER_TOKEN = cli_config.COMPLETION_PRICE_PER_1K / 1000.0
         logger_instance.info(f"Set pricing for OpenRouter/OpenAI: Prompt=${cli_config.PROMPT_PRICE_PER_1K}/1k, Completion=${cli_config.COMPLETION_PRICE_PER_1K}/1k")
         # client_to_use is already openrouter_client, model_name_for_setup is new_model_name
 
-    # Re-initialize agent with the new model and appropriate client
-    new_agent_instance, new_instructions = setup_agent(
-        logger_instance,
-        servers_list,
-        base_samples_dir,
-        model_name=model_name_for_setup, # Use the potentially stripped model name for Ollama
-        client=client_to_use,           # Use the client specific to the service
-        extra_headers=extra_headers if not new_model_name.startswith("ollama/") else None # Ollama might not need/use these headers
-    )
+    # Re-initialize agent with the new model and appropriate client, unless an identical one was built recently
+    agent_cache_key = (model_name_for_setup, tuple(servers_list), base_samples_dir, str(client_to_use.base_url))
+    cached_agent = _agent_cache.get(agent_cache_key)
+    if cached_agent is not None:
+        _agent_cache.move_to_end(agent_cache_key)
+        new_agent_instance, new_instructions = cached_agent
+        logger_instance.info(f"Reusing cached agent for {new_model_name}")
+    else:
+        new_agent_instance, new_instructions = setup_agent(
+            logger_instance,
+            servers_list,
+            base_samples_dir,
+            model_name=model_name_for_setup, # Use the potentially stripped model name for Ollama
+            client=client_to_use,           # Use the client specific to the service
+            extra_headers=extra_headers if not is_ollama else None # Ollama might not need/use these headers
+        )
+        _agent_cache[agent_cache_key] = (new_agent_instance, new_instructions)
+        if len(_agent_cache) > _AGENT_CACHE_MAXSIZE:
+            _agent_cache.popitem(last=False)
     
     # Re-initialize tokenizer for the new model (using the full name like "ollama/llama3" for mapping)
     tokenizer_global = initialize_tokenizer(current_model_name_global, tiktoken_map, logger_instance)
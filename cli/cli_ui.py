@@ -1,9 +1,31 @@
+import os
+import select
 import sys
 import tty
 import termios
 from typing import List, Optional, Any # Any for Colors module/class
 
 # ─── HELPER FUNCTION FOR INTERACTIVE MODEL SELECTION ───────────────────────────
+_CLEAR_SCREEN = "\033[2J\033[H" # Erase the screen and move the cursor home, without a full terminal reset
+_FIRST_OPTION_ROW = 4 # 1-based screen row of the first option (below the title, help line and a blank line)
+
+_ESC_SEQUENCE_TIMEOUT = 0.05 # Seconds to wait for the rest of an escape sequence before treating ESC as a bare keypress
+
+def _read_key_char(fd: int) -> str:
+    """Reads one byte straight from the terminal fd, bypassing sys.stdin's buffer so select() sees what is pending."""
+    return os.read(fd, 1).decode("utf-8", errors="ignore")
+
+def _key_pending(fd: int, timeout: float) -> bool:
+    readable, _, _ = select.select([fd], [], [], timeout)
+    return bool(readable)
+
+def _format_option_line(option: str, is_selected: bool, is_active: bool, colors_module: Any) -> str:
+    """Returns one menu line, highlighted when it is the current selection."""
+    display_option_text = option + " (current)" if is_active else option
+    if is_selected:
+        return f"{colors_module.USER_PROMPT}> {colors_module.BOLD}{display_option_text}{colors_module.ENDC}{colors_module.ENDC}"
+    return f"{colors_module.SYSTEM_INFO}  {display_option_text}{colors_module.ENDC}"
+
 def select_model_interactive(
     prompt_title: str,
     options: List[str],
@@ -14,74 +36,82 @@ def select_model_interactive(
     Provides an interactive command-line interface for selecting a model.
     Uses raw terminal mode for arrow key navigation.
     """
-    old_settings = termios.tcgetattr(sys.stdin.fileno())
+    stdin_fd = sys.stdin.fileno()
+    old_settings = termios.tcgetattr(stdin_fd)
     try:
-        tty.setraw(sys.stdin.fileno())
+        tty.setraw(stdin_fd)
 
         if not options:
             sys.stdout.write(f"{colors_module.LOG_ERROR}No models available for selection.{colors_module.ENDC}\r\n")
             sys.stdout.flush()
             # Wait for a key press before returning, to allow user to see the message
-            sys.stdin.read(1)
+            _read_key_char(stdin_fd)
             return None
 
-        try:
-            current_selection_index = options.index(active_model_value)
-        except ValueError:
-            # If active_model_value is not in options (e.g., if it was removed or is invalid),
-            # default to the first option.
-            current_selection_index = 0
-
-        while True:
-            # Clear screen or redraw in place (using ANSI codes)
-            # \033c is a common sequence for resetting the terminal, often clearing it.
-            sys.stdout.write("\033c")
+        # Locate the active model once; -1 means it is not among the options (e.g., removed or invalid)
+        active_idx = next((i for i, option in enumerate(options) if option == active_model_value), -1)
+        # Start on the active model, or default to the first option if it is missing
+        current_selection_index = active_idx if active_idx >= 0 else 0
 
-            sys.stdout.write(f"{prompt_title}\r\n")
-            sys.stdout.write(f"{colors_module.SYSTEM_INFO}Use ARROW UP/DOWN to navigate, ENTER to select, ESC to cancel.{colors_module.ENDC}\r\n\r\n")
+        # Both renderings of every option are formatted once; redraws just pick the right one.
+        selected_lines = [_format_option_line(option, True, i == active_idx, colors_module) for i, option in enumerate(options)]
+        unselected_lines = [_format_option_line(option, False, i == active_idx, colors_module) for i, option in enumerate(options)]
 
-            for i, option in enumerate(options):
-                prefix = "> " if i == current_selection_index else "  "
+        # Draw the whole menu once; afterwards only the lines whose selection state changed are rewritten in place.
+        # Output is collected into one string per redraw and written with a single write + flush.
+        parts: List[str] = [
+            _CLEAR_SCREEN,
+            f"{prompt_title}\r\n",
+            f"{colors_module.SYSTEM_INFO}Use ARROW UP/DOWN to navigate, ENTER to select, ESC to cancel.{colors_module.ENDC}\r\n\r\n",
+        ]
+        for i in range(len(options)):
+            parts.append(selected_lines[i] if i == current_selection_index else unselected_lines[i])
+            parts.append("\r\n")
+        sys.stdout.write("".join(parts))
+        sys.stdout.flush()
 
-                display_option_text = option
-                if option == active_model_value:
-                    display_option_text += " (current)"
-
-                if i == current_selection_index:
-                    # Highlight the current selection
-                    sys.stdout.write(f"{colors_module.USER_PROMPT}{prefix}{colors_module.BOLD}{display_option_text}{colors_module.ENDC}{colors_module.ENDC}\r\n")
-                else:
-                    sys.stdout.write(f"{colors_module.SYSTEM_INFO}{prefix}{display_option_text}{colors_module.ENDC}\r\n")
-            sys.stdout.flush()
+        while True:
+            previous_selection_index = current_selection_index
 
             # Read a single character for input
-            char = sys.stdin.read(1)
+            char = _read_key_char(stdin_fd)
 
             if char == '\x1b':  # Escape character (used for ESC key and arrow keys)
-                # Try to read the rest of an escape sequence (non-blocking if possible, but read(1) is blocking)
-                next_char1 = sys.stdin.read(1) # If it's just ESC, this might block or get next input
+                # Real escape sequences arrive together with the ESC byte; if nothing follows shortly, it was a bare ESC
+                next_char1 = _read_key_char(stdin_fd) if _key_pending(stdin_fd, _ESC_SEQUENCE_TIMEOUT) else ''
                 if next_char1 == '[': # Start of a CSI sequence (e.g., arrow keys)
-                    next_char2 = sys.stdin.read(1)
+                    next_char2 = _read_key_char(stdin_fd) if _key_pending(stdin_fd, _ESC_SEQUENCE_TIMEOUT) else ''
                     if next_char2 == 'A':  # Up arrow
                         current_selection_index = (current_selection_index - 1 + len(options)) % len(options)
                     elif next_char2 == 'B':  # Down arrow
                         current_selection_index = (current_selection_index + 1) % len(options)
                     # Other CSI sequences (like Home, End, other arrows) could be handled here if needed
                 else: # Likely just the ESC key pressed (\x1b followed by something not '[' or nothing)
-                    sys.stdout.write("\033c") # Clear screen
+                    sys.stdout.write(_CLEAR_SCREEN)
                     sys.stdout.flush()
                     return None # Cancelled
             elif char == '\r' or char == '\n':  # Enter key
-                sys.stdout.write("\033c") # Clear screen
+                sys.stdout.write(_CLEAR_SCREEN)
                 sys.stdout.flush()
                 return options[current_selection_index]
             elif char == '\x03': # Ctrl+C
                 # Restore terminal settings before raising KeyboardInterrupt
-                termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, old_settings)
+                termios.tcsetattr(stdin_fd, termios.TCSADRAIN, old_settings)
                 raise KeyboardInterrupt
             # Ignore other characters
+
+            if current_selection_index == previous_selection_index:
+                continue # Stray key or unhandled sequence: nothing on screen changed
+
+            # Rewrite the previously and newly selected lines at their fixed rows
+            parts = []
+            for i in (previous_selection_index, current_selection_index):
+                parts.append(f"\033[{_FIRST_OPTION_ROW + i};1H\033[2K")
+                parts.append(selected_lines[i] if i == current_selection_index else unselected_lines[i])
+            sys.stdout.write("".join(parts))
+            sys.stdout.flush()
     finally:
         # Always restore terminal settings
-        termios.tcsetattr(sys.stdin.fileno(), termios.TCSADRAIN, old_settings)
+        termios.tcsetattr(stdin_fd, termios.TCSADRAIN, old_settings)
 # ─── END HELPER FUNCTION ───────────────────────────────────────────────────────
 from mcp_local_modules.mcp_utils import Colors # For printing colored messages
@@ -0,0 +1,26 @@
+from typing import Dict, Tuple
+import httpx
+from openai import AsyncOpenAI
+
+# One pooled connection set per endpoint; creating a client per request leaks sockets and file descriptors
+_POOL_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+_clients: Dict[Tuple[str, str], AsyncOpenAI] = {}
+
+def get_client(base_url: str, api_key: str) -> AsyncOpenAI:
+    """Returns the shared AsyncOpenAI client for an endpoint, creating it on first use."""
+    client = _clients.get((base_url, api_key))
+    if client is None:
+        client = AsyncOpenAI(
+            base_url=base_url,
+            api_key=api_key,
+            http_client=httpx.AsyncClient(limits=_POOL_LIMITS),
+        )
+        _clients[(base_url, api_key)] = client
+    return client
+
+async def close_clients():
+    """Closes every client handed out by get_client(); call once at shutdown."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.close()
@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+from typing import Dict, Set, Tuple
+from agents.mcp.server import MCPServerStdio
+
+def compute_hash(params: dict, timeout=None) -> str:
+    """Stable key for a stdio server config: args keep their order, env items are sorted so dict order does not matter."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(params["command"].encode())
+    digest.update(b"\1")
+    digest.update(b"\0".join(str(arg).encode() for arg in params.get("args", [])))
+    digest.update(b"\1")
+    digest.update(b"\0".join(f"{k}={v}".encode() for k, v in sorted((params.get("env") or {}).items())))
+    digest.update(b"\1")
+    digest.update(repr(timeout).encode())
+    return digest.hexdigest()
+
+class OwnedConnectionMCPServerStdio(MCPServerStdio):
+    """MCPServerStdio whose connection is opened and closed inside one dedicated task.
+
+    The stdio client's anyio task group must be exited from the task that entered it; owning the
+    connection in its own task lets servers be connected concurrently and cleaned up from any task.
+    connect() on an already connected instance is a no-op, so pooled instances can be shared.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._owner_task = None
+        self._stop_requested = None
+
+    async def _own_connection(self, ready):
+        try:
+            await super().connect()
+        except Exception as e:
+            ready.set_exception(e)
+            try:
+                await super().cleanup()
+            except Exception:
+                pass
+            return
+        ready.set_result(None)
+        try:
+            await self._stop_requested.wait()
+        finally:
+            await super().cleanup()
+
+    async def connect(self):
+        if self._owner_task is not None and not self._owner_task.done():
+            return # Already connected (or connecting) for another session
+        ready = asyncio.get_running_loop().create_future()
+        self._stop_requested = asyncio.Event()
+        self._owner_task = asyncio.create_task(self._own_connection(ready))
+        await ready
+
+    async def cleanup(self):
+        if self._owner_task is asyncio.current_task():
+            # The SDK cleans up after a failed connect from inside the owner task itself
+            await super().cleanup()
+            return
+        owner_task, self._owner_task = self._owner_task, None
+        if owner_task is None:
+            return # Never connected, nothing to shut down
+        self._stop_requested.set()
+        await owner_task
+
+class McpInstancePool:
+    """Shares MCPServerStdio instances between sessions whose server configs are identical.
+
+    Each instance tracks the set of sessions holding it; the child process is cleaned up
+    as soon as the last of them releases it.
+    """
+
+    def __init__(self, server_class=MCPServerStdio):
+        self._server_class = server_class
+        self._instances: Dict[str, Tuple[MCPServerStdio, Set[str]]] = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, name, params, session_id, no_share=False, **server_kwargs) -> MCPServerStdio:
+        """Returns the pooled instance for this config, creating it on first use."""
+        session_key = str(session_id)
+        timeout = server_kwargs.get("client_session_timeout_seconds")
+        key = compute_hash(params, timeout)
+        if no_share:
+            # Servers holding per-session state get their own instance per session
+            key = f"{key}:{session_key}"
+        async with self._lock:
+            entry = self._instances.get(key)
+            if entry is None:
+                entry = (self._server_class(name=name, params=params, **server_kwargs), set())
+                self._instances[key] = entry
+            entry[1].add(session_key)
+            return entry[0]
+
+    async def release(self, session_id, logger=None, cleanup_timeout=5.0):
+        """Drops a session's hold on its instances and cleans up those no other session uses.
+
+        Each cleanup gets cleanup_timeout seconds, so one hung server cannot hold up the others or process exit.
+        """
+        session_key = str(session_id)
+        async with self._lock:
+            to_cleanup = []
+            for key, (server, holders) in list(self._instances.items()):
+                if session_key in holders:
+                    holders.discard(session_key)
+                    if not holders:
+                        del self._instances[key]
+                        to_cleanup.append(server)
+        # Each instance's shutdown waits on its own child process, so they are run side by side
+        await asyncio.gather(*(self._cleanup(server, logger, cleanup_timeout) for server in to_cleanup))
+
+    @staticmethod
+    async def _cleanup(server, logger, timeout):
+        try:
+            await asyncio.wait_for(server.cleanup(), timeout)
+            if logger:
+                logger.info(f"Successfully cleaned up server: {server.name}")
+        except asyncio.TimeoutError:
+            if logger:
+                logger.error(f"Cleaning up server {server.name} timed out after {timeout}s; abandoning it.")
+        except Exception as e:
+            if logger:
+                logger.error(f"Error cleaning up server {server.name}: {e}")
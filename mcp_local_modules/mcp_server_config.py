@@ -1,137 +1,136 @@
+import functools
+import logging
 import os
-from agents.mcp.server import MCPServerStdio # Updated import path
-from mcp_local_modules.mcp_utils import Colors # For printing status messages
-import os # Ensure os is imported if not already
+from types import MappingProxyType, SimpleNamespace
+from mcp_local_modules.mcp_instance_pool import McpInstancePool
+from mcp_local_modules.mcp_utils import have
+from mcp_local_modules.tools_cache import CachedToolsMCPServerStdio
 
-async def configure_servers(logger, script_dir, samples_dir):
-    """Configures all MCP servers and returns their instances without testing."""
-    
-    # Configure the MCP Code Executor server
-    # logger.info("Configuring MCP Code Executor server...") # Reduced verbosity
-    mcp_server_python = MCPServerStdio(
-        name="MCP Code Executor",
-        params={
-            "command": "node",
-            "args": [os.path.join(script_dir, "mcp_code_executor", "build", "index.js")],
-            "env": {
-                "CODE_STORAGE_DIR": samples_dir,
-                "ENV_TYPE": "venv",
-                "VENV_PATH": os.path.join(samples_dir, "venv"),
-                "NODE_NO_WARNINGS": "1"
-            }
-        },
-        cache_tools_list=True,
-        client_session_timeout_seconds=60, # Increased timeout for code execution
-    )
-    
-    # Configure the filesystem MCP server
-    # logger.info("Configuring Filesystem MCP server...") # Reduced verbosity
-    mcp_server_filesystem = MCPServerStdio(
-        name="Filesystem Server via npx",
-        params={
-            "command": "npx",
-            "args": ["-y", "@modelcontextprotocol/server-filesystem", samples_dir],
-            "env": {"NODE_NO_WARNINGS": "1"}
-        },
-        cache_tools_list=True,
-    )
+logger = logging.getLogger(__name__)
 
-    # Configure the fetch MCP server
-    # logger.info("Configuring Fetch MCP server...") # Reduced verbosity
-    mcp_server_fetch = MCPServerStdio(
-        name="Fetch Server via uvx",
-        params={
-            "command": "uvx",
-            "args": ["mcp-server-fetch", "--ignore-robots-txt"],
-        },
-        cache_tools_list=True,
-    )
+# Sessions with identical server configs share one child process per server
+server_pool = McpInstancePool(server_class=CachedToolsMCPServerStdio)
+TOOLS_CACHE_TTL_SECONDS = 3600 # Tool lists older than this are refreshed in the background
 
-    # Configure the Brave Search MCP server
-    # logger.info("Configuring Brave Search MCP server...") # Reduced verbosity
-    mcp_server_brave = MCPServerStdio(
-        name="Brave Search Server via npx",
-        params={
-            "command": "npx",
-            "args": ["-y", "@modelcontextprotocol/server-brave-search"],
-            "env": {
-                "BRAVE_API_KEY": os.getenv("BRAVE_API_KEY"),
-                "NODE_NO_WARNINGS": "1"
-            },
-        },
-        cache_tools_list=True,
-    )
+_NODE_WARN_OFF = {"NODE_NO_WARNINGS": "1"}
 
-    # Configure the Obsidian MCP server
-    # logger.info("Configuring Obsidian MCP server...") # Reduced verbosity
-    mcp_server_obsidian = MCPServerStdio(
-        name="Obsidian MCP Server",
-        params={
-            "command": "npx",
-            "args": [
-                "-y",
-                "mcp-obsidian",
-                "/Users/milanboonstra/Library/Mobile Documents/iCloud~md~obsidian/Documents"
-            ],
-            "env": {"NODE_NO_WARNINGS": "1"}
-        },
-        cache_tools_list=True,
-    )
+@functools.lru_cache(maxsize=1)
+def _secret_envs():
+    """Builds the API-key env dicts once, on the first configure call.
 
-    # Configure the Telegram MCP server
-    # logger.info("Configuring Telegram MCP server...") # Reduced verbosity
-    mcp_server_telegram = MCPServerStdio(
-        name="Telegram MCP Server",
-        params={
-            "command": "node",
-            "args": ["/Users/milanboonstra/Documents/Cline/MCP/telegram-server/build/index.js"],
-            "env": {
-                "TELEGRAM_BOT_TOKEN": os.getenv("TELEGRAM_BOT_TOKEN", ""), # Default to empty string if not set
-                "DEFAULT_CHAT_ID": os.getenv("DEFAULT_CHAT_ID", os.getenv("TELEGRAM_CHAT_ID", "")), # Use DEFAULT_CHAT_ID
-                "NODE_NO_WARNINGS": "1"
-            }
-        },
-        cache_tools_list=True,
+    Not done at import time: agentweb imports this module before it loads .env.
+    """
+    brave_key = os.environ.get("BRAVE_API_KEY")
+    if brave_key is None:
+        logger.warning("BRAVE_API_KEY is not set; the Brave Search server will not be able to search.")
+    brave_env = {"BRAVE_API_KEY": brave_key, **_NODE_WARN_OFF}
+    telegram_env = {
+        "TELEGRAM_BOT_TOKEN": os.getenv("TELEGRAM_BOT_TOKEN", ""), # Default to empty string if not set
+        "DEFAULT_CHAT_ID": os.getenv("DEFAULT_CHAT_ID", os.getenv("TELEGRAM_CHAT_ID", "")), # Use DEFAULT_CHAT_ID
+        **_NODE_WARN_OFF,
+    }
+    perplexity_env = {"PERPLEXITY_API_KEY": os.getenv("PERPLEXITY_API_KEY"), **_NODE_WARN_OFF}
+    return brave_env, telegram_env, perplexity_env
+
+@functools.lru_cache(maxsize=8)
+def _paths(script_dir, samples_dir):
+    """Paths derived from the project and samples directories, joined once per directory pair."""
+    return SimpleNamespace(
+        executor_js=os.path.join(script_dir, "mcp_code_executor", "build", "index.js"),
+        venv=os.path.join(samples_dir, "venv"),
     )
 
-    # Configure the Perplexity MCP server
-    mcp_server_perplexity = MCPServerStdio(
-        name="Perplexity MCP Server",
-        params={
-            "command": "node",
+def _cmd(name):
+    """Absolute path of a launcher from the memoized PATH lookup, so spawning a server skips the PATH walk."""
+    return have(name) or name
+
+def resolve_bin(script_dir, pkg, entry="dist/index.js", runtime_args=(), npx_spec=None):
+    """Returns a direct `node` launch for an npm server installed by scripts/install_mcp_deps.py, else the `npx -y` form."""
+    entry_path = os.path.join(script_dir, "mcp_deps", "node_modules", pkg, *entry.split("/"))
+    if os.path.isfile(entry_path):
+        return {"command": _cmd("node"), "args": [entry_path, *runtime_args]}
+    return {"command": _cmd("npx"), "args": ["-y", npx_spec or pkg, *runtime_args]}
+
+@functools.lru_cache(maxsize=8)
+def _server_specs(script_dir, samples_dir):
+    """(name, params, extra MCPServerStdio kwargs) for every MCP server, built once per directory pair."""
+    brave_env, telegram_env, perplexity_env = _secret_envs()
+    paths = _paths(script_dir, samples_dir)
+    node_warn_off = MappingProxyType(_NODE_WARN_OFF)
+    return (
+        # MCP Code Executor; increased timeout for code execution
+        ("MCP Code Executor", {
+            "command": _cmd("node"),
+            "args": [paths.executor_js],
+            "env": MappingProxyType({
+                **_NODE_WARN_OFF,
+                "CODE_STORAGE_DIR": samples_dir,
+                "ENV_TYPE": "venv",
+                "VENV_PATH": paths.venv,
+            }),
+        }, {"client_session_timeout_seconds": 60}),
+        ("Filesystem Server via npx", {
+            **resolve_bin(script_dir, "@modelcontextprotocol/server-filesystem", runtime_args=(samples_dir,)),
+            "env": node_warn_off,
+        }, {}),
+        ("Fetch Server via uvx", {
+            "command": _cmd("uvx"),
+            "args": ["mcp-server-fetch", "--ignore-robots-txt"],
+        }, {}),
+        ("Brave Search Server via npx", {
+            **resolve_bin(script_dir, "@modelcontextprotocol/server-brave-search"),
+            "env": MappingProxyType(brave_env),
+        }, {}),
+        ("Obsidian MCP Server", {
+            **resolve_bin(
+                script_dir,
+                "mcp-obsidian",
+                runtime_args=("/Users/milanboonstra/Library/Mobile Documents/iCloud~md~obsidian/Documents",)
+            ),
+            "env": node_warn_off,
+        }, {}),
+        # Telegram bot session state is per agent session, so this server is never shared
+        ("Telegram MCP Server", {
+            "command": _cmd("node"),
+            "args": ["/Users/milanboonstra/Documents/Cline/MCP/telegram-server/build/index.js"],
+            "env": MappingProxyType(telegram_env),
+        }, {"no_share": True}),
+        # Perplexity; increased timeout for research queries
+        ("Perplexity MCP Server", {
+            "command": _cmd("node"),
             "args": ["/Users/milanboonstra/Documents/Cline/MCP/perplexity-mcp/build/index.js"],
-            "env": {
-                "PERPLEXITY_API_KEY": os.getenv("PERPLEXITY_API_KEY"),
-                "NODE_NO_WARNINGS": "1"
-            }
-        },
-        cache_tools_list=True,
-        client_session_timeout_seconds=60, # Increased timeout for Perplexity server
-    )
-    
-    # Configure the Context7 MCP server
-    mcp_server_context7 = MCPServerStdio(
-        name="Context7 Server",
-        params={
-            "command": "npx",
-            "args": ["-y", "@upstash/context7-mcp@latest"],
-            "env": {"NODE_NO_WARNINGS": "1"}
-        },
-        cache_tools_list=True,
+            "env": MappingProxyType(perplexity_env),
+        }, {"client_session_timeout_seconds": 60}),
+        ("Context7 Server", {
+            **resolve_bin(script_dir, "@upstash/context7-mcp", npx_spec="@upstash/context7-mcp@latest"),
+            "env": node_warn_off,
+        }, {}),
     )
 
+async def configure_servers(logger, script_dir, samples_dir, session_id=None):
+    """Configures all MCP servers and returns their instances without testing."""
+    if session_id is None:
+        session_id = id(logger)
+
     all_configured_servers = [
-        mcp_server_python,
-        mcp_server_filesystem,
-        mcp_server_fetch,
-        mcp_server_brave,
-        mcp_server_obsidian,
-        mcp_server_telegram, # Added Telegram server
-        mcp_server_perplexity,
-        mcp_server_context7, # Added Context7 server
+        await server_pool.acquire(
+            name=name,
+            params=params,
+            cache_tools_list=True,
+            cache_ttl_seconds=TOOLS_CACHE_TTL_SECONDS,
+            session_id=session_id,
+            **extra_kwargs,
+        )
+        for name, params, extra_kwargs in _server_specs(script_dir, samples_dir)
     ]
     
     logger.info(f"Configured {len(all_configured_servers)} MCP server instances. Connection attempts will be made by the agent.")
     # No print message about successful connections here as connections haven't been attempted yet.
 
     return all_configured_servers
+
+async def release_servers(logger, session_id=None):
+    """Releases this session's pooled servers; a server is cleaned up once no session holds it."""
+    if session_id is None:
+        session_id = id(logger)
+    await server_pool.release(session_id, logger)
@@ -1,10 +1,18 @@
 import asyncio
+import collections
+import functools
+import json
 import os
-import shutil # For checking if npx/uvx exists
 import logging
 import sys
 import venv
-import subprocess
+
+try:
+    from mcp_local_modules.mcp_utils import have
+    from mcp_local_modules.mcp_instance_pool import OwnedConnectionMCPServerStdio
+except ImportError: # Run directly as a script from inside mcp_local_modules/
+    from mcp_utils import have
+    from mcp_instance_pool import OwnedConnectionMCPServerStdio
 
 # Define ANSI color codes
 class Colors:
@@ -18,6 +26,17 @@ class Colors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+    @classmethod
+    def disable(cls):
+        """Blanks every color code so printed text carries no ANSI escapes."""
+        for name, value in list(vars(cls).items()):
+            if name.isupper() and isinstance(value, str):
+                setattr(cls, name, "")
+
+# Honour NO_COLOR (https://no-color.org) and skip escapes when output is redirected
+if os.environ.get("NO_COLOR") or not sys.stdout.isatty():
+    Colors.disable()
+
 # Custom Formatter for logging
 class ColoredFormatter(logging.Formatter):
     LEVEL_COLORS = {
@@ -28,14 +47,26 @@ class ColoredFormatter(logging.Formatter):
         logging.CRITICAL: Colors.FAIL + Colors.BOLD,
     }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Colored level names are built once per level instead of once per record
+        self._level_cache = {lvl: f"{c}{logging.getLevelName(lvl)}{Colors.ENDC}" for lvl, c in self.LEVEL_COLORS.items()}
+        # Colors are wasted when the log stream is redirected to a file or pipe
+        self._is_tty = sys.stderr.isatty()
+
     def format(self, record):
-        color = self.LEVEL_COLORS.get(record.levelno, Colors.ENDC)
-        record.levelname = f"{color}{record.levelname}{Colors.ENDC}"
-        record.name = f"{Colors.OKBLUE}{record.name}{Colors.ENDC}"
+        if not self._is_tty:
+            return super().format(record)
+        record.levelname = self._level_cache.get(record.levelno, record.levelname)
+        record.name = _color_name(record.name)
         # Apply color to the whole message for simplicity here, or customize further
         # record.msg = f"{color}{record.msg}{Colors.ENDC}" # This would color the whole message
         return super().format(record)
 
+@functools.lru_cache(maxsize=64)
+def _color_name(name):
+    return f"{Colors.OKBLUE}{name}{Colors.ENDC}"
+
 # Set up logging
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)  # Keep our script's logs at INFO level
@@ -59,61 +90,88 @@ logging.getLogger("httpx").setLevel(logging.WARNING)
 # Disable OpenAI API logging
 logging.getLogger("openai").setLevel(logging.WARNING)
 
+# Script, project root and sample files directories; fixed for the life of the process
+_SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+_PARENT_DIR = os.path.dirname(_SCRIPT_DIR)
+_SAMPLES_DIR = os.path.join(_PARENT_DIR, "sample_mcp_files")
+
+# Keys of a code execution result from the MCP Code Executor
+_CODE_EXEC_KEYS = frozenset({"status", "output", "error", "file_path"})
+# Servers whose tools are only offered to the agent when the user message mentions one of these keywords.
+# Unlisted servers are always on. Leaving out servers a message does not call for keeps their tool schemas out of the prompt.
+TRIGGER_KEYWORDS = {
+    "Brave Search Server via npx": {"search", "google", "web", "news", "brave", "latest", "current"},
+    "RSS Feed Server": {"rss", "feed"},
+}
+
+# MCP Code Executor tools whose call arguments are echoed after each turn
+_CODE_EXEC_TOOLS = frozenset({"execute_code", "install_dependencies", "check_installed_packages"})
+
 # Import necessary components from the Agents SDK
 from agents import Agent, Runner, trace
-from agents.mcp.server import MCPServerStdio # Updated import path
 
-# Ensure npx and uvx are available in the system path
-if not shutil.which("npx"):
-    raise RuntimeError(
-        "npx command not found. Please install Node.js and npm from https://nodejs.org/"
-    )
-if not shutil.which("uvx"):
-    raise RuntimeError(
-        "uvx command not found. Please ensure uvx (part of uv) is installed and in your PATH. See https://github.com/astral-sh/uv"
-    )
+def check_required_commands():
+    """Ensure npx and uvx are available in the system path."""
+    if not have("npx"):
+        raise RuntimeError(
+            "npx command not found. Please install Node.js and npm from https://nodejs.org/"
+        )
+    if not have("uvx"):
+        raise RuntimeError(
+            "uvx command not found. Please ensure uvx (part of uv) is installed and in your PATH. See https://github.com/astral-sh/uv"
+        )
 
-def install_basic_packages(venv_path):
+def _venv_python_path(venv_path):
+    if os.name == 'nt':  # Windows
+        return os.path.join(venv_path, "Scripts", "python.exe")
+    return os.path.join(venv_path, "bin", "python")
+
+async def install_basic_packages(venv_path, verbose=False):
     """Install basic packages in the virtual environment."""
     logger.info("Installing basic packages in the virtual environment...")
     
-    # Determine the pip executable path based on the platform
-    if os.name == 'nt':  # Windows
-        pip_path = os.path.join(venv_path, "Scripts", "pip.exe")
-    else:  # Unix/Linux/Mac
-        pip_path = os.path.join(venv_path, "bin", "pip")
-    
-    # Check if pip exists
-    if not os.path.exists(pip_path):
-        logger.error(f"Pip not found at {pip_path}")
-        return False
-    
     # Basic packages to install
     packages = ["feedparser", "requests", "beautifulsoup4", "pandas", "matplotlib"]
     
+    # uv resolves and downloads in parallel and is much faster than pip; pip is the fallback
+    uv_path = have("uv")
+    if uv_path:
+        cmd = [uv_path, "pip", "install", "--python", _venv_python_path(venv_path)] + packages
+    else:
+        # Determine the pip executable path based on the platform
+        if os.name == 'nt':  # Windows
+            pip_path = os.path.join(venv_path, "Scripts", "pip.exe")
+        else:  # Unix/Linux/Mac
+            pip_path = os.path.join(venv_path, "bin", "pip")
+        
+        # Check if pip exists
+        if not os.path.exists(pip_path):
+            logger.error(f"Pip not found at {pip_path}")
+            return False
+        cmd = [pip_path, "install"] + packages
+    
     try:
         # Install packages
-        cmd = [pip_path, "install"] + packages
         logger.info(f"Running command: {' '.join(cmd)}")
         
-        # Run the command and capture output
-        process = subprocess.Popen(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE,
-            text=True
+        # Stream the installer output line by line instead of buffering all of it
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
         )
+        recent_lines = collections.deque(maxlen=20) # Kept to explain a failure when not verbose
+        async for raw_line in process.stdout:
+            line = raw_line.decode(errors="replace").rstrip()
+            recent_lines.append(line)
+            if verbose:
+                logger.info(line)
+        returncode = await process.wait()
         
-        # Print output in real-time
-        stdout, stderr = process.communicate()
-        
-        if stdout:
-            logger.info(f"Pip install output: {stdout}")
-        if stderr:
-            logger.warning(f"Pip install warnings/errors: {stderr}")
-        
-        if process.returncode != 0:
-            logger.error(f"Failed to install packages. Return code: {process.returncode}")
+        if returncode != 0:
+            if not verbose:
+                logger.warning("Pip install output (last lines):\n" + "\n".join(recent_lines))
+            logger.error(f"Failed to install packages. Return code: {returncode}")
             return False
         
         logger.info("Basic packages installed successfully")
@@ -126,17 +184,17 @@ def ensure_venv_exists(venv_path):
     """Create a virtual environment if it doesn't exist."""
     created_new = False
     
-    if os.path.exists(venv_path) and os.path.isdir(venv_path):
-        # Check if it's a valid venv by looking for key files
-        if os.path.exists(os.path.join(venv_path, "Scripts", "activate")) or \
-           os.path.exists(os.path.join(venv_path, "bin", "activate")):
-            logger.info(f"Virtual environment already exists at {venv_path}")
-            return True, False  # exists, not newly created
+    # Check if it's a valid venv by looking for its interpreter (a single stat)
+    if os.path.isfile(_venv_python_path(venv_path)):
+        logger.info(f"Virtual environment already exists at {venv_path}")
+        return True, False  # exists, not newly created
     
     # Create the virtual environment
     logger.info(f"Creating virtual environment at {venv_path}...")
     try:
-        venv.create(venv_path, with_pip=True)
+        # Symlink the interpreter instead of copying it (not on Windows) and skip upgrading pip/setuptools
+        builder = venv.EnvBuilder(with_pip=True, symlinks=(os.name != 'nt'), upgrade_deps=False, clear=False)
+        builder.create(venv_path)
         logger.info(f"Virtual environment created successfully at {venv_path}")
         created_new = True
         return True, created_new  # success, newly created
@@ -144,17 +202,110 @@ def ensure_venv_exists(venv_path):
         logger.error(f"Failed to create virtual environment: {e}")
         return False, False  # failed, not created
 
-async def test_single_server(server_name, server_instance):
-    """Test a single MCP server connection."""
-    logger.info(f"Testing connection to {server_name}...")
-    try:
-        # We can't set timeout directly as it's not supported
-        async with server_instance:
-            logger.info(f"Successfully connected to {server_name}!")
-            return True
-    except Exception as e:
-        logger.error(f"Failed to connect to {server_name}: {e}")
-        return False
+class LazyMcpServerStdio(OwnedConnectionMCPServerStdio):
+    """OwnedConnectionMCPServerStdio that spawns its child process on the first tool listing or call instead of at startup.
+
+    Servers the session never needs are never started. A server that fails to start is logged once
+    and contributes no tools, so one broken server does not break every agent turn.
+    """
+
+    def __init__(self, *args, triggers=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Keywords that enable this server for a turn; None means the server is always offered to the agent
+        self.triggers = frozenset(triggers) if triggers is not None else None
+        self._connect_lock = asyncio.Lock()
+        self._connect_failed = False
+
+    async def connect(self):
+        # Deferred until the first list_tools/call_tool
+        return
+
+    @property
+    def is_always_on(self):
+        return self.triggers is None
+
+    def matches(self, lowered_message):
+        """Whether a (lower-cased) user message mentions one of this server's trigger keywords."""
+        return self.is_always_on or any(keyword in lowered_message for keyword in self.triggers)
+
+    @property
+    def _is_connected(self):
+        return self._owner_task is not None and not self._owner_task.done()
+
+    async def _ensure_connected(self):
+        if self._is_connected or self._connect_failed:
+            return
+        async with self._connect_lock:
+            if self._is_connected or self._connect_failed:
+                return
+            logger.info(f"Connecting to {self.name} on first use...")
+            try:
+                await super().connect()
+            except Exception as e:
+                self._connect_failed = True
+                logger.error(f"Failed to connect to {self.name}: {e}")
+                return
+            logger.info(f"Successfully connected to {self.name}!")
+
+    async def list_tools(self, *args, **kwargs):
+        await self._ensure_connected()
+        if not self._is_connected:
+            return []
+        return await super().list_tools(*args, **kwargs)
+
+    async def call_tool(self, *args, **kwargs):
+        await self._ensure_connected()
+        return await super().call_tool(*args, **kwargs)
+
+    async def shutdown(self, timeout=2.0, kill_timeout=0.5):
+        """cleanup() with a deadline: a server that has not exited after timeout seconds has its connection
+        task cancelled, which makes the stdio client terminate and then kill the child process."""
+        owner_task = self._owner_task
+        try:
+            await asyncio.wait_for(self.cleanup(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.name} did not shut down within {timeout}s, stopping its process...")
+            if owner_task is not None and not owner_task.done():
+                owner_task.cancel()
+                await asyncio.wait({owner_task}, timeout=kill_timeout)
+        except Exception as e:
+            logger.error(f"Error cleaning up server {self.name}: {e}")
+
+def _iter_events(raw_responses):
+    """Walks the model responses once, yielding ("tool", name), ("code_call", name, arguments) and ("code_result", data)."""
+    for response in raw_responses:
+        # Check if the response object has an 'output' attribute and it's a list
+        output = getattr(response, 'output', None)
+        if isinstance(output, list):
+            for output_item in output:
+                # Check if the item looks like a tool call
+                if getattr(output_item, 'type', None) != 'function_call':
+                    continue
+                tool_name = getattr(output_item, 'name', None)
+                if not tool_name:
+                    continue
+                tool_name = str(tool_name)
+                yield ("tool", tool_name)
+                # For code execution tools, extract more details
+                if tool_name in _CODE_EXEC_TOOLS:
+                    arguments = getattr(output_item, 'arguments', None)
+                    if arguments:
+                        yield ("code_call", tool_name, arguments)
+
+        # Check for tool responses
+        content = getattr(response, 'content', None)
+        if isinstance(content, list):
+            for content_item in content:
+                text = getattr(content_item, 'text', None)
+                # Only text that can be a JSON object or array is worth handing to json.loads
+                if not text or text.lstrip()[:1] not in ('{', '['):
+                    continue
+                try:
+                    # Try to parse as JSON to extract structured information
+                    response_data = json.loads(text)
+                except ValueError:
+                    continue # Not JSON, ignore
+                yield ("code_result", response_data)
 
 async def main():
     # --- 1. Set up the MCP Server ---
@@ -162,10 +313,8 @@ async def main():
     # Get the absolute path to the directory containing sample files
     # Use an explicit path to ensure files are always saved in the correct location
     # Calculate samples_dir relative to the parent directory (the project root)
-    parent_dir = os.path.dirname(os.path.abspath(__file__))
-    samples_dir = os.path.join(os.path.dirname(parent_dir), "sample_mcp_files")
     # Ensure this is the absolute path: C:\Users\milanb\code\openaisdkmcp\sample_mcp_files
-    samples_dir = os.path.abspath(samples_dir)
+    samples_dir = _SAMPLES_DIR
     
     logger.info(f"Sample files directory: {samples_dir}")
     # Print the absolute path to verify it's correct
@@ -176,10 +325,9 @@ async def main():
         os.makedirs(samples_dir, exist_ok=True)
         logger.info(f"Created sample directory: {samples_dir}")
 
-    # script_dir is the directory of the current script (mcp)
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    # parent_dir is the project root
-    parent_dir = os.path.dirname(script_dir)
+    # script_dir is the directory of the current script (mcp), parent_dir is the project root
+    script_dir = _SCRIPT_DIR
+    parent_dir = _PARENT_DIR
     
     # Ensure the virtual environment exists
     venv_path = os.path.join(samples_dir, "venv")
@@ -191,7 +339,7 @@ async def main():
     elif venv_created:
         # If we created a new venv, install basic packages
         logger.info("New virtual environment created, installing basic packages...")
-        if install_basic_packages(venv_path):
+        if await install_basic_packages(venv_path):
             logger.info("Basic packages installed successfully in the new virtual environment.")
             print(f"{Colors.OKGREEN}Basic packages installed successfully in the new virtual environment.{Colors.ENDC}")
         else:
@@ -200,7 +348,7 @@ async def main():
     
     # Configure the MCP Code Executor server
     logger.info("Configuring MCP Code Executor server...")
-    mcp_server_python = MCPServerStdio(
+    mcp_server_python = LazyMcpServerStdio(
         name="MCP Code Executor", # A name for tracing/logging
         params={
             "command": "node", # Assuming node is in PATH
@@ -209,7 +357,7 @@ async def main():
             "env": {
                 "CODE_STORAGE_DIR": samples_dir,
                 "ENV_TYPE": "venv",
-                "VENV_PATH": os.path.join(samples_dir, "venv")
+                "VENV_PATH": venv_path
             }
         },
         cache_tools_list=True,
@@ -217,7 +365,7 @@ async def main():
     
     # Configure the filesystem MCP server to run via npx
     logger.info("Configuring Filesystem MCP server...")
-    mcp_server_filesystem = MCPServerStdio(
+    mcp_server_filesystem = LazyMcpServerStdio(
         name="Filesystem Server via npx", # A name for tracing/logging
         params={
             "command": "npx",
@@ -230,7 +378,7 @@ async def main():
 
     # Configure the fetch MCP server to run via uvx
     logger.info("Configuring Fetch MCP server...")
-    mcp_server_fetch = MCPServerStdio(
+    mcp_server_fetch = LazyMcpServerStdio(
         name="Fetch Server via uvx",
         params={
             "command": "uvx",
@@ -241,8 +389,9 @@ async def main():
 
     # Configure the Brave Search MCP server
     logger.info("Configuring Brave Search MCP server...")
-    mcp_server_brave = MCPServerStdio(
+    mcp_server_brave = LazyMcpServerStdio(
         name="Brave Search Server via npx",
+        triggers=TRIGGER_KEYWORDS["Brave Search Server via npx"],
         params={
             "command": "npx",
             "args": ["-y", "@modelcontextprotocol/server-brave-search"],
@@ -253,8 +402,9 @@ async def main():
 
     # Configure the RSS Feed MCP server
     logger.info("Configuring RSS Feed MCP server...")
-    mcp_server_rss = MCPServerStdio(
+    mcp_server_rss = LazyMcpServerStdio(
         name="RSS Feed Server", # A name for tracing/logging
+        triggers=TRIGGER_KEYWORDS["RSS Feed Server"],
         params={
             "command": "node", # Assuming node is in PATH
             "args": [os.path.join(script_dir, "rss-feed-server", "rss-feed-server", "build", "rss-feed-server", "index.js")],
@@ -262,33 +412,15 @@ async def main():
         cache_tools_list=True,
     )
 
-    # Test each server individually
-    logger.info("Testing individual server connections...")
-    
-    python_success = await test_single_server("MCP Code Executor", mcp_server_python)
-    fs_success = await test_single_server("Filesystem Server", mcp_server_filesystem)
-    fetch_success = await test_single_server("Fetch Server", mcp_server_fetch)
-    brave_success = await test_single_server("Brave Search Server", mcp_server_brave)
-    rss_success = await test_single_server("RSS Feed Server", mcp_server_rss)
-    
-    # Only proceed with servers that connected successfully
-    working_servers = []
-    if fs_success:
-        working_servers.append(mcp_server_filesystem)
-    if fetch_success:
-        working_servers.append(mcp_server_fetch)
-    if brave_success:
-        working_servers.append(mcp_server_brave)
-    if rss_success:
-        working_servers.append(mcp_server_rss)
-    if python_success:
-        working_servers.append(mcp_server_python)
-    
-    if not working_servers:
-        logger.error("No MCP servers connected successfully. Exiting.")
-        return
-    
-    logger.info(f"Successfully connected to {len(working_servers)} out of 5 servers.")
+    # Servers connect lazily on first use; servers that fail to start contribute no tools
+    working_servers = [
+        mcp_server_filesystem,
+        mcp_server_fetch,
+        mcp_server_brave,
+        mcp_server_rss,
+        mcp_server_python,
+    ]
+    logger.info(f"Configured {len(working_servers)} servers; each connects on first use.")
 
 
     # --- 2. Set up the Agent ---
@@ -304,7 +436,7 @@ async def main():
             "Use the available tools (like list_directory, read_file, write_file, fetch, brave_search, get_rss_feed, execute_code, install_dependencies, check_installed_packages) "
             "to answer questions based on local files, web resources, current events, RSS feeds, or by executing code."
         ),
-        mcp_servers=working_servers,  # Only use servers that connected successfully
+        mcp_servers=working_servers,  # Servers that fail to connect expose no tools
         # We'll use a default OpenAI model here just for the agent logic,
         # the core interaction is via the MCP tools.
         model="gpt-4o-mini",
@@ -313,24 +445,13 @@ async def main():
     # --- 3. Run the Agent Interactively ---
     logger.info("Starting interactive session...")
     
-    # Create a context manager for all working servers
-    async def connect_servers():
-        for server in working_servers:
-            await server.connect()
-        return working_servers
-        
     async def cleanup_servers():
-        for server in working_servers:
-            try:
-                await server.cleanup()
-            except Exception as e:
-                logger.error(f"Error cleaning up server {server.name}: {e}")
+        # Shut the servers down concurrently and with a deadline, so exit waits at most for the slowest one
+        # shutdown() logs its own errors, so no exceptions need to be collected here
+        await asyncio.gather(*(server.shutdown() for server in working_servers))
     
     try:
-        # Connect all working servers
-        await connect_servers()
-        
-        print(f"{Colors.OKGREEN}MCP Servers connected ({len(working_servers)} of 5). Starting interactive chat...{Colors.ENDC}")
+        print(f"{Colors.OKGREEN}MCP Servers configured ({len(working_servers)}); they connect on first use. Starting interactive chat...{Colors.ENDC}")
         print(f"{Colors.OKCYAN}Type 'quit' or 'exit' to end the session.{Colors.ENDC}")
 
         conversation_history_items = [] # Initialize conversation history
@@ -339,12 +460,16 @@ async def main():
         with trace("MCP Interactive Session"): # Updated trace name
             while True:
                 try:
-                    # Get user input
-                    user_input_text = input(f"\n{Colors.BOLD}You: {Colors.ENDC}")
+                    # Get user input in a worker thread so the event loop keeps servicing the MCP servers meanwhile
+                    user_input_text = await asyncio.to_thread(input, f"\n{Colors.BOLD}You: {Colors.ENDC}")
                     if user_input_text.lower() in ["quit", "exit"]:
                         print(f"{Colors.WARNING}Exiting chat.{Colors.ENDC}")
                         break
 
+                    # Only offer the servers this message calls for; triggered servers stay unconnected until needed
+                    lowered_input = user_input_text.lower()
+                    agent.mcp_servers = [server for server in working_servers if server.matches(lowered_input)]
+
                     # Prepare the input for the current turn by appending the new user message to the history
                     current_turn_input = conversation_history_items + [{"role": "user", "content": user_input_text}]
 
@@ -358,80 +483,55 @@ async def main():
                     conversation_history_items = result.to_input_list()
 
                     # --- Extract and Print Tool Usage and Details from raw_responses ---
-                    tool_names_used = set()
-                    tool_details = []
-                    
-                    if hasattr(result, 'raw_responses') and result.raw_responses:
-                        for response in result.raw_responses:
-                            # Check if the response object has an 'output' attribute and it's a list
-                            if hasattr(response, 'output') and isinstance(response.output, list):
-                                for output_item in response.output:
-                                    # Check if the item looks like a tool call
-                                    if hasattr(output_item, 'name') and \
-                                       hasattr(output_item, 'type') and \
-                                       getattr(output_item, 'type') == 'function_call':
-                                        tool_name = getattr(output_item, 'name', None)
-                                        if tool_name:
-                                            tool_names_used.add(str(tool_name))
-                                            
-                                            # For code execution tools, extract and log more details
-                                            if tool_name in ['execute_code', 'install_dependencies', 'check_installed_packages']:
-                                                if hasattr(output_item, 'arguments') and output_item.arguments:
-                                                    tool_details.append({
-                                                        'tool': tool_name,
-                                                        'arguments': output_item.arguments
-                                                    })
-                            
-                            # Check for tool responses
-                            if hasattr(response, 'content') and isinstance(response.content, list):
-                                for content_item in response.content:
-                                    if hasattr(content_item, 'text') and content_item.text:
-                                        try:
-                                            # Try to parse as JSON to extract structured information
-                                            import json
-                                            response_data = json.loads(content_item.text)
-                                            
-                                            # Ensure response_data is a dictionary before accessing keys
-                                            if isinstance(response_data, dict):
-                                                # If this is a code execution response, log it
-                                                if 'status' in response_data and ('output' in response_data or 'error' in response_data):
-                                                    print(f"\n{Colors.HEADER}--- Code Execution Result ---{Colors.ENDC}")
-                                                    print(f"{Colors.BOLD}Status:{Colors.ENDC} {response_data['status']}")
-                                                    
-                                                    if 'file_path' in response_data:
-                                                        print(f"{Colors.BOLD}File:{Colors.ENDC} {response_data['file_path']}")
-                                                    
-                                                    if 'output' in response_data:
-                                                        print(f"{Colors.BOLD}Output:{Colors.ENDC}")
-                                                        print(f"{Colors.OKGREEN}{response_data['output']}{Colors.ENDC}")
-                                                    
-                                                    if 'error' in response_data:
-                                                        print(f"{Colors.BOLD}Error:{Colors.ENDC}")
-                                                        print(f"{Colors.FAIL}{response_data['error']}{Colors.ENDC}")
-                                                    
-                                                    print(f"{Colors.HEADER}---------------------------{Colors.ENDC}")
-                                            else:
-                                                # Handle case where response_data is not a dictionary
-                                                print(f"\n{Colors.HEADER}--- Code Execution Result ---{Colors.ENDC}")
-                                                print(f"{Colors.BOLD}Response:{Colors.ENDC}")
-                                                print(f"{Colors.OKGREEN}{response_data}{Colors.ENDC}")
-                                                print(f"{Colors.HEADER}---------------------------{Colors.ENDC}")
-                                        except Exception:
-                                            # Not JSON or not a code execution response, ignore
-                                            pass
-
+                    events = list(_iter_events(getattr(result, 'raw_responses', None) or ()))
+
+                    for kind, *payload in events:
+                        if kind != "code_result":
+                            continue
+                        response_data = payload[0]
+                        # Ensure response_data is a dictionary before accessing keys
+                        if isinstance(response_data, dict):
+                            result_keys = response_data.keys() & _CODE_EXEC_KEYS
+                            # If this is a code execution response, log it
+                            if 'status' in result_keys and ('output' in result_keys or 'error' in result_keys):
+                                print(f"\n{Colors.HEADER}--- Code Execution Result ---{Colors.ENDC}")
+                                print(f"{Colors.BOLD}Status:{Colors.ENDC} {response_data['status']}")
+
+                                if 'file_path' in result_keys:
+                                    print(f"{Colors.BOLD}File:{Colors.ENDC} {response_data['file_path']}")
+
+                                if 'output' in result_keys:
+                                    print(f"{Colors.BOLD}Output:{Colors.ENDC}")
+                                    print(f"{Colors.OKGREEN}{response_data['output']}{Colors.ENDC}")
+
+                                if 'error' in result_keys:
+                                    print(f"{Colors.BOLD}Error:{Colors.ENDC}")
+                                    print(f"{Colors.FAIL}{response_data['error']}{Colors.ENDC}")
+
+                                print(f"{Colors.HEADER}---------------------------{Colors.ENDC}")
+                        else:
+                            # Handle case where response_data is not a dictionary
+                            print(f"\n{Colors.HEADER}--- Code Execution Result ---{Colors.ENDC}")
+                            print(f"{Colors.BOLD}Response:{Colors.ENDC}")
+                            print(f"{Colors.OKGREEN}{response_data}{Colors.ENDC}")
+                            print(f"{Colors.HEADER}---------------------------{Colors.ENDC}")
+
+                    tool_names_used = {payload[0] for kind, *payload in events if kind == "tool"}
                     if tool_names_used:
-                        print(f"\n{Colors.OKCYAN}[Tools Used: {', '.join(sorted(list(tool_names_used)))}]{Colors.ENDC}")
+                        print(f"\n{Colors.OKCYAN}[Tools Used: {', '.join(sorted(tool_names_used))}]{Colors.ENDC}")
                     
                     # Log detailed tool usage for debugging
-                    for detail in tool_details:
-                        if detail['tool'] == 'execute_code' and 'code' in detail['arguments']:
+                    for kind, *payload in events:
+                        if kind != "code_call":
+                            continue
+                        tool_name, arguments = payload
+                        if tool_name == 'execute_code' and 'code' in arguments:
                             print(f"\n{Colors.HEADER}--- Code Executed ---{Colors.ENDC}")
-                            print(f"{Colors.OKBLUE}{detail['arguments']['code']}{Colors.ENDC}")
+                            print(f"{Colors.OKBLUE}{arguments['code']}{Colors.ENDC}")
                             print(f"{Colors.HEADER}-------------------{Colors.ENDC}")
-                        elif detail['tool'] == 'install_dependencies' and 'packages' in detail['arguments']:
+                        elif tool_name == 'install_dependencies' and 'packages' in arguments:
                             print(f"\n{Colors.HEADER}--- Packages Installed ---{Colors.ENDC}")
-                            print(f"{Colors.OKBLUE}{', '.join(detail['arguments']['packages'])}{Colors.ENDC}")
+                            print(f"{Colors.OKBLUE}{', '.join(arguments['packages'])}{Colors.ENDC}")
                             print(f"{Colors.HEADER}------------------------{Colors.ENDC}")
                     # --- End Extract and Print ---
 
@@ -439,7 +539,7 @@ async def main():
                     print(f"\n{Colors.BOLD}Agent:{Colors.ENDC}")
                     print(f"{Colors.OKBLUE}{result.final_output}{Colors.ENDC}")
 
-                except KeyboardInterrupt:
+                except (KeyboardInterrupt, asyncio.CancelledError):
                     print(f"\n{Colors.WARNING}Exiting chat due to interrupt.{Colors.ENDC}")
                     break
                 except Exception as e:
@@ -453,6 +553,14 @@ async def main():
         print(f"\n{Colors.OKGREEN}Chat session complete. MCP Servers disconnected.{Colors.ENDC}")
 
 if __name__ == "__main__":
+    check_required_commands()
+    # uvloop's libuv-based pipe transports read the MCP servers' stdio with less per-read overhead; optional
+    if sys.platform != "win32":
+        try:
+            import uvloop
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        except ImportError:
+            pass
     # Use try-except to catch potential issues during async run, like initial connection errors
     try:
         asyncio.run(main())
@@ -1,6 +1,12 @@
+import asyncio
+import functools
+import json
 import logging
 import os
+import shutil
 import subprocess
+import sys
+import time
 import venv
 
 # Define ANSI color codes
@@ -21,6 +27,17 @@ class Colors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+    @classmethod
+    def disable(cls):
+        """Blanks every color code so printed text carries no ANSI escapes."""
+        for name, value in list(vars(cls).items()):
+            if name.isupper() and isinstance(value, str):
+                setattr(cls, name, "")
+
+# Honour NO_COLOR (https://no-color.org) and skip escapes when output is redirected
+if os.environ.get("NO_COLOR") or not sys.stdout.isatty():
+    Colors.disable()
+
 # Custom Formatter for logging
 class ColoredFormatter(logging.Formatter):
     LEVEL_COLORS = {
@@ -31,60 +48,152 @@ class ColoredFormatter(logging.Formatter):
         logging.CRITICAL: Colors.LOG_ERROR + Colors.BOLD,
     }
 
+    # Colored level names and logger names are built once instead of per record
+    _LEVEL_PREFIX = {lvl: f"{color}{logging.getLevelName(lvl)}{Colors.ENDC}" for lvl, color in LEVEL_COLORS.items()}
+    _NAME_CACHE = {}
+
     def format(self, record):
-        color = self.LEVEL_COLORS.get(record.levelno, Colors.ENDC)
-        record.levelname = f"{color}{record.levelname}{Colors.ENDC}"
-        record.name = f"{Colors.LOG_NAME}{record.name}{Colors.ENDC}"
+        levelname = self._LEVEL_PREFIX.get(record.levelno)
+        if levelname is None: # Custom level
+            levelname = f"{Colors.ENDC}{record.levelname}{Colors.ENDC}"
+        record.levelname = levelname
+        name = self._NAME_CACHE.get(record.name)
+        if name is None:
+            name = self._NAME_CACHE.setdefault(record.name, f"{Colors.LOG_NAME}{record.name}{Colors.ENDC}")
+        record.name = name
         return super().format(record)
 
+_INFO_PREFIX = Colors.LOG_INFO
+_ERROR_PREFIX = Colors.LOG_ERROR
+_COLOR_SUFFIX = f"{Colors.ENDC}\n"
+
+def print_info(msg):
+    """Prints msg in the info color with a single write; the color codes are read once, after NO_COLOR is applied."""
+    sys.stdout.write(f"{_INFO_PREFIX}{msg}{_COLOR_SUFFIX}")
+
+def print_error(msg):
+    """Prints msg in the error color with a single write."""
+    sys.stdout.write(f"{_ERROR_PREFIX}{msg}{_COLOR_SUFFIX}")
+
+_LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# One handler shared by every logger set up here, so they write to stderr through a single stream lock.
+# Level filtering is left to each logger. Logs going to a file or CI capture get plain records with no color work.
+_SHARED_HANDLER = logging.StreamHandler()
+_SHARED_HANDLER.setFormatter(
+    ColoredFormatter(_LOG_FORMAT)
+    if not os.environ.get("NO_COLOR") and _SHARED_HANDLER.stream.isatty()
+    else logging.Formatter(_LOG_FORMAT)
+)
+
 def setup_colored_logger(name, level=logging.INFO):
     """Sets up a logger with colored output."""
     logger = logging.getLogger(name)
     logger.setLevel(level)
     
-    if not logger.handlers:
-        ch = logging.StreamHandler()
-        ch.setLevel(level)
-        formatter = ColoredFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-        ch.setFormatter(formatter)
-        logger.addHandler(ch)
+    if _SHARED_HANDLER not in logger.handlers:
+        logger.addHandler(_SHARED_HANDLER)
     
     logger.propagate = False
     return logger
 
-def install_basic_packages(logger, venv_path):
-    """Install basic packages in the virtual environment."""
+# Resolved launcher paths, kept between runs: {"npx": {"path": ..., "checked": <epoch seconds>}, ...}
+_BINS_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "openaisdkmcp", "bins.json")
+_BINS_CACHE_TTL_SECONDS = 86400
+
+@functools.lru_cache(maxsize=None)
+def have(cmd):
+    """shutil.which, looked up once per process for each command and cached on disk between runs.
+
+    A cached path is trusted after a stat and an os.access check instead of a stat per PATH entry.
+    """
+    try:
+        with open(_BINS_CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if not isinstance(cache, dict):
+        cache = {}
+    entry = cache.get(cmd)
+    if isinstance(entry, dict):
+        path = entry.get("path")
+        if path and time.time() - entry.get("checked", 0) <= _BINS_CACHE_TTL_SECONDS and os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    path = shutil.which(cmd)
+    if path: # Misses are not cached, so a freshly installed command is found on the next run
+        cache[cmd] = {"path": path, "checked": time.time()}
+        try:
+            os.makedirs(os.path.dirname(_BINS_CACHE_PATH), exist_ok=True)
+            with open(_BINS_CACHE_PATH, "w", encoding="utf-8") as f:
+                json.dump(cache, f)
+        except OSError:
+            pass
+    return path
+
+def _venv_python_path(venv_path):
     if os.name == 'nt':
-        pip_path = os.path.join(venv_path, "Scripts", "pip.exe")
-    else:
-        pip_path = os.path.join(venv_path, "bin", "pip")
-    
-    if not os.path.exists(pip_path):
-        logger.error(f"Pip not found at {pip_path}")
+        return os.path.join(venv_path, "Scripts", "python.exe")
+    return os.path.join(venv_path, "bin", "python")
+
+BASIC_PACKAGES = ("feedparser", "requests", "beautifulsoup4", "pandas", "matplotlib")
+
+async def basic_packages_present(venv_path):
+    """Checks via the venv's own interpreter whether every basic package is already installed."""
+    check = f"import importlib.metadata as m;[m.version(p) for p in {BASIC_PACKAGES!r}]"
+    try:
+        process = await asyncio.create_subprocess_exec(
+            _venv_python_path(venv_path), "-c", check,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        return await process.wait() == 0
+    except OSError:
         return False
+
+async def install_basic_packages(logger, venv_path):
+    """Install basic packages in the virtual environment, skipping pip when they are already present."""
+    packages = list(BASIC_PACKAGES)
+    
+    if await basic_packages_present(venv_path):
+        logger.debug("Basic packages already present, skipping install.")
+        return True
     
-    packages = ["feedparser", "requests", "beautifulsoup4", "pandas", "matplotlib"]
+    uv_path = have("uv")
+    if uv_path:
+        # uv resolves and downloads in parallel and needs no pip inside the venv
+        cmd = [uv_path, "pip", "install", "-q", "--python", _venv_python_path(venv_path), *packages]
+    else:
+        if os.name == 'nt':
+            pip_path = os.path.join(venv_path, "Scripts", "pip.exe")
+        else:
+            pip_path = os.path.join(venv_path, "bin", "pip")
+        
+        if not os.path.exists(pip_path):
+            logger.error(f"Pip not found at {pip_path}")
+            return False
+        # Never prompt, and take wheels over sdists when both exist so nothing is built from source
+        cmd = [pip_path, "install", "-q", "--disable-pip-version-check", "--no-input", "--prefer-binary", *packages]
     
     try:
-        cmd = [pip_path, "install"] + packages
-        process = subprocess.Popen(
-            cmd, 
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE,
-            text=True
+        # stdout is discarded rather than buffered; only stderr is read, and the event loop stays free meanwhile
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
         )
-        stdout, stderr = process.communicate()
+        stderr_bytes = await process.stderr.read()
+        returncode = await process.wait()
+        stderr = stderr_bytes.decode(errors="replace").strip()
         
         if stderr:
             # Log warnings/errors but don't fail install for them unless returncode is non-zero
             # Some packages print to stderr for non-critical things
-            logger.warning(f"Pip install stderr: {stderr.strip()}")
+            logger.warning(f"Pip install stderr: {stderr}")
         
-        if process.returncode != 0:
-            logger.error(f"Failed to install packages. Pip return code: {process.returncode}\nStdout:\n{stdout}\nStderr:\n{stderr}")
+        if returncode != 0:
+            logger.error(f"Failed to install packages. Pip return code: {returncode}")
             return False
         
-        # logger.info(f"Pip install stdout: {stdout.strip()}") # Can be noisy
         return True
     except Exception as e:
         logger.error(f"Error installing packages: {e}")
@@ -94,21 +203,50 @@ def ensure_venv_exists(logger, venv_path):
     """Create a virtual environment if it doesn't exist."""
     created_new = False
     
-    if os.path.exists(venv_path) and os.path.isdir(venv_path):
-        if os.path.exists(os.path.join(venv_path, "Scripts", "activate")) or \
-           os.path.exists(os.path.join(venv_path, "bin", "activate")):
-            return True, False
+    # A venv is usable if its interpreter exists; one stat instead of probing both activate scripts
+    if os.path.isfile(_venv_python_path(venv_path)):
+        return True, False
     
     try:
-        venv.create(venv_path, with_pip=True)
+        uv_path = have("uv")
+        if uv_path:
+            # uv creates the venv in milliseconds; --seed still puts pip in it for the code executor's install_dependencies
+            subprocess.run([uv_path, "venv", "-q", "--seed", venv_path], check=True)
+        else:
+            # Symlink the interpreter instead of copying it (not on Windows) and skip upgrading pip/setuptools
+            builder = venv.EnvBuilder(with_pip=True, symlinks=(os.name != 'nt'), upgrade_deps=False, clear=False)
+            builder.create(venv_path)
         created_new = True
         return True, created_new
     except Exception as e:
         logger.error(f"Failed to create virtual environment: {e}")
         return False, False
 
+async def prepare_env(logger, samples_dir):
+    """Creates the code-execution venv off the event loop and installs the basic packages into it.
+
+    Returns (venv_ok, packages_ok), so it can run alongside server startup.
+    """
+    venv_path = os.path.join(samples_dir, "venv")
+    venv_ok, _ = await asyncio.to_thread(ensure_venv_exists, logger, venv_path)
+    if not venv_ok:
+        return False, False
+    return True, await install_basic_packages(logger, venv_path)
+
 def indent_multiline_text(text, prefix="    "):
     """Indents each line of a given string."""
     if text is None:
         return prefix + "None"
-    return "\n".join([prefix + line for line in str(text).splitlines()])
\ No newline at end of file
+    text = str(text)
+    if not text:
+        return text
+    # A single str.replace is much cheaper than splitting and re-joining large tool outputs.
+    if text.endswith("\n"):
+        text = text[:-1]
+    return prefix + text.replace("\n", "\n" + prefix)
+
+def truncate_text(text, max_chars):
+    """Cuts a string down to max_chars, noting how much was left out. Non-strings are returned unchanged."""
+    if not isinstance(text, str) or max_chars <= 0 or len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}\n... [{len(text) - max_chars} characters omitted]"
\ No newline at end of file
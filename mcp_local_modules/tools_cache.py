@@ -0,0 +1,83 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import List, Optional, Tuple
+from mcp.types import Tool
+from mcp_local_modules.mcp_instance_pool import OwnedConnectionMCPServerStdio, compute_hash
+
+logger = logging.getLogger(__name__)
+
+TOOLS_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "openaisdkmcp", "tools")
+
+def _cache_path(cache_hash: str) -> str:
+    return os.path.join(TOOLS_CACHE_DIR, f"{cache_hash}.json")
+
+def load(cache_hash: str, ttl: float) -> Optional[Tuple[List[Tool], bool]]:
+    """Returns (tools, is_fresh) for a cached tool list, or None if there is no usable cache entry."""
+    path = _cache_path(cache_hash)
+    try:
+        age = time.time() - os.path.getmtime(path)
+        with open(path, "r", encoding="utf-8") as f:
+            tools = [Tool.model_validate(item) for item in json.load(f)]
+    except (OSError, ValueError):
+        return None
+    return tools, age <= ttl
+
+def store(cache_hash: str, tools: List[Tool]):
+    """Writes a tool list to the cache; the file is replaced atomically so readers never see a partial write."""
+    path = _cache_path(cache_hash)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(TOOLS_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump([tool.model_dump(mode="json", by_alias=True, exclude_none=True) for tool in tools], f)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Could not write tools cache {path}: {e}")
+
+class CachedToolsMCPServerStdio(OwnedConnectionMCPServerStdio):
+    """MCPServerStdio whose tool list is persisted on disk and served stale-while-revalidate.
+
+    A cached list is returned without a list_tools round trip; if it is older than
+    cache_ttl_seconds it is refreshed in the background, and a failed refresh keeps the stale list.
+    Cache files are read and written in a worker thread, off the event loop.
+    """
+
+    def __init__(self, *args, cache_ttl_seconds: float = 3600, cache_hash: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._cache_hash = cache_hash or compute_hash(self.params.model_dump())
+        self._disk_tools: Optional[List[Tool]] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def _refresh_in_background(self, *args, **kwargs):
+        try:
+            tools = await super().list_tools(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"Background tool list refresh for {self.name} failed, keeping cached list: {e}")
+            return
+        await asyncio.to_thread(store, self._cache_hash, tools)
+        self._disk_tools = tools
+
+    async def list_tools(self, *args, **kwargs):
+        if self._disk_tools is None:
+            cached = await asyncio.to_thread(load, self._cache_hash, self.cache_ttl_seconds)
+            if cached is None:
+                tools = await super().list_tools(*args, **kwargs)
+                await asyncio.to_thread(store, self._cache_hash, tools)
+                self._disk_tools = tools
+                return tools
+            self._disk_tools, is_fresh = cached
+            if not is_fresh:
+                self._refresh_task = asyncio.create_task(self._refresh_in_background(*args, **kwargs))
+        return self._disk_tools
+
+    async def cleanup(self):
+        # Stop a pending refresh first, so it never calls list_tools on a session that is being torn down
+        refresh_task, self._refresh_task = self._refresh_task, None
+        if refresh_task is not None and not refresh_task.done():
+            refresh_task.cancel()
+            await asyncio.wait({refresh_task})
+        await super().cleanup()
@@ -1,7 +1,7 @@
 import asyncio
-from openai import OpenAI
 import os
 import sys
+from mcp_local_modules.llm_client import get_client, close_clients
 
 async def main():
     # Set base_url to include /v1
@@ -12,10 +12,7 @@ async def main():
     
     print(f"Attempting to connect to Ollama at: {ollama_base_url}")
     
-    client = OpenAI(
-        base_url=ollama_base_url,
-        api_key=dummy_api_key 
-    )
+    client = get_client(ollama_base_url, dummy_api_key)
     
     # Get model name from command line argument or use default
     model_name = sys.argv[1] if len(sys.argv) > 1 else "phi4-mini:latest"
@@ -27,8 +24,8 @@ async def main():
     
     try:
         while True:
-            # Get user input
-            user_input = input("\nYou: ")
+            # Get user input off the event loop
+            user_input = await asyncio.to_thread(input, "\nYou: ")
             
             # Check for exit command
             if user_input.lower() in ["exit", "quit", "q"]:
@@ -39,18 +36,24 @@ async def main():
             conversation_history.append({"role": "user", "content": user_input})
             
             try:
-                # Call the Ollama API
-                response = client.chat.completions.create(
+                # Call the Ollama API, streaming so tokens are printed as they arrive
+                response = await client.chat.completions.create(
                     model=model_name,
                     messages=conversation_history,
-                    stream=False
+                    stream=True
                 )
                 
-                # Get the assistant's response
-                assistant_message = response.choices[0].message.content
-                
-                # Print the response
-                print(f"\nAssistant: {assistant_message}")
+                print("\nAssistant: ", end="", flush=True)
+                message_parts = []
+                async for chunk in response:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        print(delta, end="", flush=True)
+                        message_parts.append(delta)
+                print()
+                assistant_message = "".join(message_parts)
                 
                 # Add assistant message to conversation history
                 conversation_history.append({"role": "assistant", "content": assistant_message})
@@ -60,8 +63,10 @@ async def main():
                 if hasattr(e, 'body'):
                     print(f"Error details: {e.body}")
     
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         print("\nExiting chat due to keyboard interrupt.")
+    finally:
+        await close_clients()
 
 if __name__ == "__main__":
     asyncio.run(main())
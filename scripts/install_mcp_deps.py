@@ -0,0 +1,27 @@
+"""Installs the npm-based MCP servers into <project>/mcp_deps so they can be started with `node` directly instead of `npx -y`."""
+import os
+import shutil
+import subprocess
+import sys
+
+MCP_NPM_PACKAGES = [
+    "@modelcontextprotocol/server-filesystem",
+    "@modelcontextprotocol/server-brave-search",
+    "mcp-obsidian",
+    "@upstash/context7-mcp",
+]
+
+def main():
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    deps_dir = os.path.join(project_dir, "mcp_deps")
+    npm = shutil.which("npm")
+    if not npm:
+        print("npm command not found. Please install Node.js and npm from https://nodejs.org/")
+        return 1
+    os.makedirs(deps_dir, exist_ok=True)
+    cmd = [npm, "install", "--prefix", deps_dir] + MCP_NPM_PACKAGES
+    print(f"Running command: {' '.join(cmd)}")
+    return subprocess.run(cmd).returncode
+
+if __name__ == "__main__":
+    sys.exit(main())